@@ -27,7 +27,9 @@ with app.app_context():
     with db.engine.connect() as conn:
         result = conn.execute(text('select 1;'))
         print('Database connection successful: ', result.fetchone())
-    GDFListHandler()
+    gdf_list_handler = GDFListHandler()
+    if gdf_list_handler.lookup_cache is not None:
+        gdf_list_handler.lookup_cache.set_redis_client(redis_client)
 
 # user = UserEntity(username='admin2', password='admin', nickname='管理员')
 # with app.app_context():
@@ -1,17 +1,17 @@
 import time
 from datetime import datetime
+from typing import Optional
 
-import gpxpy
-from flask import Blueprint, request
+from flask import Blueprint, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
 from loguru import logger
-from sqlalchemy import insert
 
 from ext import redis_client
-from dto.route import Route
-from entity.route import RouteEntity, RoutePointEntity
+from dto.route import Route, segment_route_name
+from entity.route import RouteEntity, RoutePointEntity, RoutePointBulkWriter
 from ext import db
 from gpxutil.models.enum_class import CoordinateType
+from gpxutil.utils.gpx_reader import read_gpx_segment
 from vo import Response
 from tasks import set_route_point_area_task, add_set_route_points_area_task
 
@@ -37,7 +37,13 @@ def create_route():
 def get_route(route_id: int):
     route = RouteEntity.query.filter_by(id=route_id, is_deleted=False).first()
     if route:
-        response = Response(code=200, message='success', data=route.to_json())
+        # 只返回第一页点，其余的点通过 GET /route/<id>/points?after=<next_points_after> 获取
+        data = route.to_json_self()
+        data['points'], next_after = RoutePointEntity.json_page(
+            route.id, None, current_app.config.get('ROUTE_POINTS_PAGE_SIZE', 1000)
+        )
+        data['next_points_after'] = _format_points_cursor(next_after)
+        response = Response(code=200, message='success', data=data)
     else:
         response = Response(code=404, message='route not found')
     return response.to_json()
@@ -137,14 +143,49 @@ def add_route_points(route_id: int):
     return response.to_resp()
 
 
+def _parse_points_cursor(cursor: Optional[str]) -> Optional[tuple[int, int]]:
+    """
+    解析分页获取点时的 after 参数（"idx,id"）
+    :param cursor: after 参数，可以为 None
+    :return: (idx, id)，cursor 为空时为 None
+    """
+    if not cursor:
+        return None
+    idx, point_id = cursor.split(',')
+    return int(idx), int(point_id)
+
+
+def _format_points_cursor(cursor: Optional[tuple[int, int]]) -> Optional[str]:
+    return f'{cursor[0]},{cursor[1]}' if cursor is not None else None
+
+
 @route_bp.route('/<int:route_id>/points', methods=['GET'])
 def get_route_points(route_id: int):
+    """
+    分页获取行程的点，按 idx 排序。查询参数：
+    - after：上一页返回的 next_after（"idx,id"），不传时从第一个点开始
+    - limit：每页点数，默认 ROUTE_POINTS_PAGE_SIZE，不超过 ROUTE_POINTS_MAX_PAGE_SIZE
+    - fields：逗号分隔的字段，默认返回全部字段，idx 总会返回
+    返回 {'points': [...], 'next_after': 下一页的 after}，没有下一页时 next_after 为 None。
+    idx 不保证唯一，所以按 (idx, id) 排序、分页。
+    """
     route = RouteEntity.query.filter_by(id=route_id, is_deleted=False).first()
-    if route:
-        points = route.points
-        response = Response(code=200, message='success', data=[point.to_json() for point in points if not point.is_deleted])
-    else:
-        response = Response(code=404, message='route not found', http_code=404)
+    if not route:
+        return Response(code=404, message='route not found', http_code=404).to_resp()
+    try:
+        after = _parse_points_cursor(request.args.get('after'))
+    except ValueError:
+        return Response(code=400, message='invalid after', http_code=400).to_resp()
+    limit = request.args.get('limit', current_app.config.get('ROUTE_POINTS_PAGE_SIZE', 1000), type=int)
+    limit = max(1, min(limit, current_app.config.get('ROUTE_POINTS_MAX_PAGE_SIZE', 10000)))
+    fields = request.args.get('fields')
+    if fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    try:
+        points, next_after = RoutePointEntity.json_page(route.id, after, limit, fields or None)
+    except ValueError as e:
+        return Response(code=400, message=str(e), http_code=400).to_resp()
+    response = Response(code=200, message='success', data={'points': points, 'next_after': _format_points_cursor(next_after)})
     return response.to_resp()
 
 
@@ -225,53 +266,94 @@ def delete_point(point_id: int):
     return response.to_resp()
 
 
+def _insert_imported_route(
+        route: Route, user_id: int, name: str, description: str,
+        coordinate_type: CoordinateType, transformed_coordinate_type: CoordinateType,
+        point_writer: RoutePointBulkWriter
+) -> int:
+    """
+    在当前事务中插入一条导入的行程及其所有点，不提交。
+    :return: 行程 ID
+    """
+    route_entity_bare = RouteEntity(
+        name=name,
+        description=description,
+        coordinate_type=coordinate_type.value,
+        transformed_coordinate_type=transformed_coordinate_type.value,
+        segment_starts=','.join(map(str, route.segment_start_idxs())) or None,
+        create_user=user_id,
+        update_user=user_id
+    )
+    db.session.add(route_entity_bare)
+    db.session.flush()  # 获取route_entity的ID，但不提交事务
+    # 下面不能使用 returning, mysql 不支持？
+    point_writer.add(route_entity_bare.id, route.points)
+    point_writer.flush()
+    return route_entity_bare.id
+
+
 @route_bp.route('/import', methods=['POST'])
 @jwt_required()
 def import_route():
+    """
+    导入 GPX 文件。import_mode 决定导入哪些 segment：
+    - segment（默认）：只导入 track_index、segment_index 指定的一个 segment
+    - segments：每个 track 的每个 segment 各导入为一个行程
+    - tracks：每个 track 导入为一个行程，其中的 segment 按顺序合并
+    - merged：整个文件导入为一个行程，所有 segment 按顺序合并
+    后三种方式只解析一次文件，各 segment 在进程池中并行处理，所有行程在同一个事务中插入。
+    合并而成的行程中各 segment 第一个点的 idx 保存在 segment_starts 中，也在返回结果中给出。
+    """
     start_time = time.time()
     logger.info('API started')
     user_id = current_user.id
     gpx_file = request.files.get('gpx_file')
     name = request.form.get('name')
     description = request.form.get('description')
-    track_index = int(request.form.get('track_index'))
-    segment_index = int(request.form.get('segment_index'))
+    import_mode = request.form.get('import_mode', 'segment')
     transform_coordinate = bool(int(request.form.get('transform_coordinate')))
     coordinate_type = CoordinateType(request.form.get('coordinate_type'))
     transformed_coordinate_type = CoordinateType(request.form.get('transformed_coordinate_type'))
     set_area = bool(int(request.form.get('set_area')))
     gpx_content = gpx_file.stream.read()
-    gpx = gpxpy.parse(gpx_content)
 
-    route = Route.from_gpx_obj(
-        gpx, track_index, segment_index, transform_coordinate=False, coordinate_type=coordinate_type.value,
-        transformed_coordinate_type=transformed_coordinate_type.value, set_area=False
-    )
-    logger.info(f'BEFORE transform coordinate: {time.time() - start_time}')
-    if transform_coordinate:
-        route.transform_coordinate(True)
-    logger.info(f'BEFORE entity: {time.time() - start_time}')
-    route_entity = RouteEntity.from_dto(route, user_id, name, description)
+    if import_mode == 'segment':
+        track_index = int(request.form.get('track_index'))
+        segment_index = int(request.form.get('segment_index'))
+        gpx_arrays = read_gpx_segment(gpx_content, track_index, segment_index)
+        route = Route.from_gpx_arrays(
+            gpx_arrays, transform_coordinate=False, coordinate_type=coordinate_type.value,
+            transformed_coordinate_type=transformed_coordinate_type.value, set_area=False
+        )
+        logger.info(f'BEFORE transform coordinate: {time.time() - start_time}')
+        if transform_coordinate:
+            route.transform_coordinate(True)
+        imported_routes = [(name, track_index, segment_index, route)]
+    elif import_mode in ('segments', 'tracks', 'merged'):
+        segment_routes = Route.from_gpx_segments(
+            gpx_content, transform_coordinate, coordinate_type.value, transformed_coordinate_type.value,
+            current_app.config.get('ROUTE_IMPORT_MAX_WORKERS')
+        )
+        if len(segment_routes) == 0:
+            return Response(code=400, message='no track points in gpx file', http_code=400).to_resp()
+        imported_routes = [
+            (segment_route_name(name, track_index, segment_index), track_index, segment_index, route)
+            for track_index, segment_index, route in Route.combine_segments(segment_routes, import_mode)
+        ]
+    else:
+        return Response(code=400, message=f'unknown import_mode: {import_mode}', http_code=400).to_resp()
+
     logger.info(f'BEFORE insert: {time.time() - start_time}')
-    route_entity_bare = RouteEntity(
-        name=name,
-        description=description,
-        coordinate_type=coordinate_type.value,
-        transformed_coordinate_type=transformed_coordinate_type.value,
-        create_user=user_id,
-        update_user=user_id
-    )
-    db.session.add(route_entity_bare)
-    db.session.flush()  # 获取route_entity的ID，但不提交事务
-    for i in route_entity.points:
-        i.route_id = route_entity.id
-    # 下面不能使用 returning, mysql 不支持？
-    db.session.execute(insert(RoutePointEntity), [i.to_bulk_insert_dict(route_entity_bare.id) for i in route_entity.points])
-    db.session.flush()
-    point_entities = db.session.query(RoutePointEntity).filter(RoutePointEntity.route_id == route_entity_bare.id, RoutePointEntity.is_deleted == False).all()
-    # db.session.add(route_entity)
+    inserted_routes = []
+    point_writer = RoutePointBulkWriter(user_id, current_app.config.get('ROUTE_POINT_INSERT_CHUNK_SIZE', 5000))
+    for route_name, track_index, segment_index, route in imported_routes:
+        route_id = _insert_imported_route(
+            route, user_id, route_name, description, coordinate_type, transformed_coordinate_type, point_writer
+        )
+        inserted_routes.append((route_id, track_index, segment_index, route.segment_start_idxs()))
+    logger.info(f'插入 {point_writer.row_count} 个点，共 {point_writer.chunk_count} 批，用时 {point_writer.elapsed_seconds:.3f} 秒')
+    # 所有行程在同一个事务中提交
     db.session.commit()
-    resp = Response(message="success", data={'id': route_entity_bare.id})
     # if set_area:
     #     logger.info(f'BEFORE set_area: {time.time() - start_time}')
     #     # TODO 这条语句极为耗时
@@ -284,10 +366,21 @@ def import_route():
     #     redis_client.set(set_area_task_id, ','.join(task_results_ids))
     #     logger.info(f'BEFORE resp.data: {time.time() - start_time}')
     #     resp.data['set_area_task_id'] = set_area_task_id
-    if set_area:
-        logger.info(f'BEFORE set_area: {time.time() - start_time}')
-        set_area_task_id = add_set_route_points_area_task(point_entities, user_id)
-        resp.data['set_area_task_id'] = set_area_task_id
+    route_results = []
+    for route_id, track_index, segment_index, segment_starts in inserted_routes:
+        route_result = {
+            'id': route_id, 'track_index': track_index, 'segment_index': segment_index, 'segment_starts': segment_starts
+        }
+        if set_area:
+            logger.info(f'BEFORE set_area: {time.time() - start_time}')
+            route_result['set_area_task_id'] = add_set_route_points_area_task(route_id, user_id)
+        route_results.append(route_result)
+    if import_mode == 'segment':
+        resp = Response(message="success", data={'id': route_results[0]['id']})
+        if set_area:
+            resp.data['set_area_task_id'] = route_results[0]['set_area_task_id']
+    else:
+        resp = Response(message="success", data={'routes': route_results})
     logger.info(f'FINISH: {time.time() - start_time}')
     # resp = Response(message="success", data={'id': route_entity.id})
     return resp.to_resp()
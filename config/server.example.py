@@ -10,4 +10,8 @@ class FlaskPlaygroundConfig:
         result_backend="redis://localhost",
         task_ignore_result=False,
     )
-    REDIS_URL = "redis://localhost:6379/0"
\ No newline at end of file
+    REDIS_URL = "redis://localhost:6379/0"
+    ROUTE_IMPORT_MAX_WORKERS = None  # 一次导入多个 segment 时的最大进程数，None 为 CPU 核数，1 为不使用进程池
+    ROUTE_POINT_INSERT_CHUNK_SIZE = 5000  # 导入行程时每批插入的点数
+    ROUTE_POINTS_PAGE_SIZE = 1000  # 分页获取行程的点时默认每页点数，GET /route/<id> 也只返回这么多点
+    ROUTE_POINTS_MAX_PAGE_SIZE = 10000  # 分页获取行程的点时每页最多点数
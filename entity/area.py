@@ -1,4 +1,8 @@
+import threading
+from typing import Optional
+
 from ext import db
+from gpxutil.utils.area_code_table import AreaCodeTable
 
 
 class ProvinceEntity(db.Model):
@@ -28,3 +32,27 @@ class AreaEntity(db.Model):
     city = db.relationship('CityEntity', backref=db.backref('areas'))
     province = db.relationship('ProvinceEntity', backref=db.backref('areas'))
 
+
+
+_area_code_table_lock = threading.Lock()
+_area_code_table: Optional[AreaCodeTable] = None
+
+
+def get_area_code_table() -> AreaCodeTable:
+    """
+    获取进程内共享的行政区划代码表。第一次调用时用一条联表查询读取 area、city、province 三张表，之后按代码查找不再访问数据库。
+    需要在 Flask 应用上下文中调用。
+    :return: AreaCodeTable
+    """
+    global _area_code_table
+    if _area_code_table is None:
+        with _area_code_table_lock:
+            if _area_code_table is None:
+                rows = (
+                    db.session.query(AreaEntity.code, ProvinceEntity.name, CityEntity.name, AreaEntity.name)
+                    .join(ProvinceEntity, AreaEntity.provinceCode == ProvinceEntity.code)
+                    .join(CityEntity, AreaEntity.cityCode == CityEntity.code)
+                    .all()
+                )
+                _area_code_table = AreaCodeTable(rows)
+    return _area_code_table
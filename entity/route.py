@@ -1,6 +1,12 @@
+import time
 from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from loguru import logger
+from sqlalchemy import and_, or_
 
 from dto.route import RoutePoint, Route
+from gpxutil.utils.data_type_processor import intern_or_none
 from ext import db
 
 
@@ -17,6 +23,8 @@ class RouteEntity(db.Model):
     description = db.Column(db.Text)
     coordinate_type = db.Column(db.String(10), default='wgs84')
     transformed_coordinate_type = db.Column(db.String(10), default='wgs84')
+    segment_starts = db.Column(db.Text)
+    """由多个 segment 合并而成时，各 segment 第一个点的 idx，逗号分隔"""
 
     user = db.relationship('UserEntity', backref=db.backref('routes'))
 
@@ -26,7 +34,8 @@ class RouteEntity(db.Model):
             'name': self.name,
             'description': self.description,
             'coordinate_type': self.coordinate_type,
-            'transformed_coordinate_type': self.transformed_coordinate_type
+            'transformed_coordinate_type': self.transformed_coordinate_type,
+            'segment_starts': [int(i) for i in self.segment_starts.split(',')] if self.segment_starts else []
         }
         return json_route
 
@@ -81,6 +90,9 @@ class RoutePointEntity(db.Model):
 
     parent_route = db.relationship('RouteEntity', backref=db.backref('points'))
 
+    # 按行程分页读取点时按 (idx, id) 排序、定位
+    __table_args__ = (db.Index('ix_route_points_route_id_idx_id', 'route_id', 'idx', 'id'),)
+
     def to_json(self):
         return {
             'id': self.id,
@@ -107,6 +119,52 @@ class RoutePointEntity(db.Model):
             'memo': self.memo
         }
 
+    @staticmethod
+    def json_page(
+            route_id: int, after: Optional[tuple[int, int]], limit: int, fields: Optional[Iterable[str]] = None
+    ) -> tuple[list[dict], Optional[tuple[int, int]]]:
+        """
+        按 (idx, id) 分页读取行程中未删除的点。idx 可以由用户修改，不保证唯一，所以用 (idx, id) 定位（keyset），
+        不用 offset，翻到后面的页也不会变慢；只查询需要的列，不构建 RoutePointEntity。
+        :param route_id: 行程 ID
+        :param after: 上一页最后一个点的 (idx, id)，为 None 时从第一个点开始
+        :param limit: 每页点数
+        :param fields: 返回的字段，取值见 ROUTE_POINT_JSON_FIELDS，为 None 时返回全部字段。idx、id 总会返回
+        :return: (各点的 JSON, 下一页的 after)，没有下一页时后者为 None
+        """
+        if fields is None:
+            fields = ROUTE_POINT_JSON_FIELDS
+        else:
+            fields = list(dict.fromkeys(fields))
+            unknown_fields = [field for field in fields if field not in ROUTE_POINT_JSON_FIELDS]
+            if unknown_fields:
+                raise ValueError(f'unknown fields: {", ".join(unknown_fields)}')
+            for field in ('idx', 'id'):
+                if field not in fields:
+                    fields.insert(0, field)
+        query = db.session.query(*[getattr(RoutePointEntity, field) for field in fields]).filter(
+            RoutePointEntity.route_id == route_id,
+            RoutePointEntity.is_deleted == False
+        )
+        if after is not None:
+            after_idx, after_id = after
+            query = query.filter(or_(
+                RoutePointEntity.idx > after_idx,
+                and_(RoutePointEntity.idx == after_idx, RoutePointEntity.id > after_id)
+            ))
+        # 多取一个点，用来判断是否还有下一页
+        rows = query.order_by(RoutePointEntity.idx, RoutePointEntity.id).limit(limit + 1).all()
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        time_position = fields.index('time') if 'time' in fields else None
+        points = []
+        for row in rows:
+            point = dict(zip(fields, row))
+            if time_position is not None and row[time_position] is not None:
+                point['time'] = row[time_position].strftime('%Y-%m-%d %H:%M:%S')
+            points.append(point)
+        return points, (points[-1]['idx'], points[-1]['id']) if has_next else None
+
     def to_bulk_insert_dict(self, route_id: int):
         return {
             'create_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -177,14 +235,144 @@ class RoutePointEntity(db.Model):
             distance=self.distance,
             course=self.course,
             speed=self.speed,
-            province=self.province,
-            city=self.city,
-            area=self.area,
-            province_en=self.province_en,
-            city_en=self.city_en,
-            area_en=self.area_en,
-            road_num=self.road_num,
-            road_name=self.road_name,
-            road_name_en=self.road_name_en,
+            province=intern_or_none(self.province),
+            city=intern_or_none(self.city),
+            area=intern_or_none(self.area),
+            province_en=intern_or_none(self.province_en),
+            city_en=intern_or_none(self.city_en),
+            area_en=intern_or_none(self.area_en),
+            road_num=intern_or_none(self.road_num),
+            road_name=intern_or_none(self.road_name),
+            road_name_en=intern_or_none(self.road_name_en),
             memo=self.memo
-        )
\ No newline at end of file
+        )
+
+ROUTE_POINT_JSON_FIELDS = (
+    'id', 'idx', 'time', 'elapsed_time', 'longitude', 'latitude', 'longitude_transformed', 'latitude_transformed',
+    'elevation', 'distance', 'course', 'speed', 'province', 'city', 'area', 'province_en', 'city_en', 'area_en',
+    'road_num', 'road_name', 'road_name_en', 'memo',
+)
+"""RoutePointEntity.to_json 中的字段，也是分页读取点时可以选择的字段"""
+
+ROUTE_POINT_INSERT_COLUMNS = (
+    'create_time', 'update_time', 'create_user', 'update_user', 'is_deleted', 'route_id',
+    'idx', 'time', 'elapsed_time', 'longitude', 'latitude', 'longitude_transformed', 'latitude_transformed',
+    'elevation', 'distance', 'course', 'speed', 'province', 'city', 'area', 'province_en', 'city_en', 'area_en',
+    'road_num', 'road_name', 'road_name_en', 'memo',
+)
+"""RoutePointBulkWriter 插入的列，行元组中各值的顺序与此相同"""
+
+
+def _placeholders(paramstyle: str, count: int) -> str:
+    if paramstyle == 'qmark':
+        return ', '.join('?' * count)
+    if paramstyle == 'numeric':
+        return ', '.join(f':{i + 1}' for i in range(count))
+    # format、pyformat（pymysql、mysqlclient、psycopg2）
+    return ', '.join(['%s'] * count)
+
+
+class RoutePointBulkWriter:
+    """
+    批量插入行程的点。直接把 dto 的点转换成行元组，不构建 RoutePointEntity，也不经过 SQLAlchemy 的参数处理，
+    按 chunk_size 个点一批交给数据库驱动的 executemany 执行（pymysql 会把一批拼成不超过 max_allowed_packet 的多行 VALUES）。
+    插入的点使用同一个创建时间，可以用 reset_timestamp 更新。只在当前事务中执行，不提交。
+    """
+
+    def __init__(self, user_id: int, chunk_size: int = 5000):
+        """
+        :param user_id: 创建、更新用户
+        :param chunk_size: 每批插入的点数
+        """
+        self.user_id = user_id
+        self.chunk_size = chunk_size
+        self.timestamp = datetime.now().replace(microsecond=0)
+        self.pending_rows: list[tuple] = []
+        self.chunk_count = 0
+        self.row_count = 0
+        self.elapsed_seconds = 0.0
+        """执行插入语句的总秒数"""
+        self._statement = None
+
+    def reset_timestamp(self):
+        """
+        把之后加入的点的创建时间更新为当前时间。写入器使用时间较长时（如批量导入），在每个文件开始时调用
+        :return: None
+        """
+        self.timestamp = datetime.now().replace(microsecond=0)
+
+    def rows(self, route_id: int, points: Iterable[RoutePoint]) -> Iterator[tuple]:
+        """
+        把点转换成行元组，各值的顺序与 ROUTE_POINT_INSERT_COLUMNS 相同
+        :param route_id: 行程 ID
+        :param points: 点
+        :return: 行元组
+        """
+        timestamp = self.timestamp
+        user_id = self.user_id
+        for point in points:
+            # 与 to_bulk_insert_dict 相同，时间按原时区的时刻精确到秒存储
+            point_time = point.time.replace(microsecond=0, tzinfo=None) if point.time is not None else None
+            yield (
+                timestamp, timestamp, user_id, user_id, False, route_id,
+                point.idx, point_time, point.elapsed_time, point.longitude, point.latitude,
+                point.longitude_transformed, point.latitude_transformed,
+                point.elevation, point.distance, point.course, point.speed,
+                point.province, point.city, point.area, point.province_en, point.city_en, point.area_en,
+                point.road_num, point.road_name, point.road_name_en, point.memo,
+            )
+
+    def add(self, route_id: int, points: Iterable[RoutePoint]):
+        """
+        加入一条行程的点，攒够 chunk_size 个点就插入一批
+        :param route_id: 行程 ID
+        :param points: 点
+        :return: None
+        """
+        for row in self.rows(route_id, points):
+            self.pending_rows.append(row)
+            if len(self.pending_rows) >= self.chunk_size:
+                self._insert(self.pending_rows)
+                self.pending_rows = []
+
+    def flush(self):
+        """
+        插入剩余的点
+        :return: None
+        """
+        if self.pending_rows:
+            self._insert(self.pending_rows)
+            self.pending_rows = []
+
+    def _insert(self, rows: list[tuple]):
+        connection = db.session.connection()
+        if self._statement is None:
+            self._statement = (
+                f'INSERT INTO {RoutePointEntity.__tablename__} ({", ".join(ROUTE_POINT_INSERT_COLUMNS)}) '
+                f'VALUES ({_placeholders(connection.dialect.paramstyle, len(ROUTE_POINT_INSERT_COLUMNS))})'
+            )
+        start_time = time.time()
+        connection.exec_driver_sql(self._statement, rows)
+        elapsed_seconds = time.time() - start_time
+        self.chunk_count += 1
+        self.row_count += len(rows)
+        self.elapsed_seconds += elapsed_seconds
+        logger.info(f'插入第 {self.chunk_count} 批 {len(rows)} 个点，用时 {elapsed_seconds:.3f} 秒')
+
+
+class RouteImportEntity(db.Model):
+    """
+    批量导入（ingest.py）的记录。与导入的行程、点在同一个事务中写入，重新运行时跳过内容哈希已存在的文件
+    """
+    __tablename__ = 'route_imports'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    create_time = db.Column(db.DateTime, default=datetime.now)
+    update_time = db.Column(db.DateTime, default=datetime.now)
+    create_user = db.Column(db.Integer, default=0)
+    update_user = db.Column(db.Integer, default=0)
+    is_deleted = db.Column(db.Boolean, default=False)
+    content_hash = db.Column(db.String(64), nullable=False, index=True)
+    file_name = db.Column(db.String(255))
+    route_ids = db.Column(db.Text)
+    point_count = db.Column(db.Integer, default=0)
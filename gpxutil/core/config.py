@@ -37,7 +37,14 @@ class ConfigHandler:
     def parse_config(config_raw):
         area_info = AreaInfoConfig(
             gdf_dir_path=config_raw['area_info']['gdf_dir_path'],
-            area_info_sqlite_path=config_raw['area_info']['area_info_sqlite_path']
+            area_info_sqlite_path=config_raw['area_info']['area_info_sqlite_path'],
+            cache_dir_path=config_raw['area_info'].get('cache_dir_path'),
+            grid_cell_size=config_raw['area_info'].get('grid_cell_size'),
+            lazy_load=config_raw['area_info'].get('lazy_load', False),
+            lazy_load_memory_limit_mb=config_raw['area_info'].get('lazy_load_memory_limit_mb'),
+            lazy_load_index_cache_size=config_raw['area_info'].get('lazy_load_index_cache_size', 16),
+            lookup_cache_cell_size=config_raw['area_info'].get('lookup_cache_cell_size'),
+            lookup_cache_max_size=config_raw['area_info'].get('lookup_cache_max_size', 100000)
         )
 
         color = ColorConfig(
@@ -0,0 +1,833 @@
+import io
+import sqlite3
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Optional, Any, IO, Iterable
+from zoneinfo import ZoneInfo
+
+import gpxpy
+import numpy as np
+from geopandas import GeoDataFrame
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from .route import Route, RoutePoint
+from ..utils import csv_util, json_util
+from ..utils.area_code_table import get_area_code_table
+from ..utils.area_index import AreaIndex, get_area_index
+from ..utils.gpx_convert import convert_points
+from ..utils.gpx_reader import GPXPointArrays, read_gpx_segment
+from ..utils.route_binary import write_route_binary, read_route_binary
+from ..utils.route_util import calculate_distances, calculate_speeds, calculate_courses
+
+FLOAT_FIELDS = (
+    'elapsed_time', 'longitude', 'latitude', 'longitude_transformed', 'latitude_transformed',
+    'elevation', 'distance', 'course', 'speed',
+)
+"""以 float64 数组存储的字段，缺失值为 NaN"""
+
+CATEGORY_FIELDS = (
+    'province', 'city', 'area', 'province_en', 'city_en', 'area_en',
+    'road_num', 'road_name', 'road_name_en', 'memo',
+)
+"""以字典编码存储的字符串字段"""
+
+_AREA_FIELDS = (('province', 'province_en'), ('city', 'city_en'), ('area', 'area_en'))
+"""行政区划名称字段与对应的英文名称字段"""
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_NAT = np.datetime64('NaT', 'us')
+
+
+def _tzinfo_from_name(tz_name: str) -> tzinfo:
+    """
+    把 Arrow 时间类型中的时区名称（'UTC'、'+08:00' 或 IANA 名称）转换为 tzinfo
+    """
+    if tz_name in ('UTC', 'Z', '+00:00'):
+        return timezone.utc
+    if tz_name[0] in '+-':
+        hours, minutes = tz_name[1:].split(':')
+        offset = timedelta(hours=int(hours), minutes=int(minutes))
+        return timezone(offset if tz_name[0] == '+' else -offset)
+    return ZoneInfo(tz_name)
+
+
+class CategoryColumn:
+    """
+    字典编码的字符串列。codes 中存放每行在 categories 中的序号，-1 表示 None。
+    同一个省、市、道路名称在整条行程中只保存一份。
+    """
+
+    def __init__(self, codes: np.ndarray, categories: list[str]):
+        """
+        :param codes: int32 数组
+        :param categories: 不重复的取值
+        """
+        self.codes = codes
+        self.categories = categories
+        self._category_codes: dict[str, int] = {category: code for code, category in enumerate(categories)}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, position: int) -> Optional[str]:
+        code = self.codes[position]
+        return self.categories[code] if code >= 0 else None
+
+    def __setitem__(self, position: int, value: Optional[str]):
+        self.codes[position] = self.code_of(value)
+
+    def code_of(self, value: Optional[str]) -> int:
+        """
+        获取取值对应的序号，取值不存在时添加。
+        :param value: 取值
+        :return: 序号，None 为 -1
+        """
+        if value is None:
+            return -1
+        code = self._category_codes.get(value)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(value)
+            self._category_codes[value] = code
+        return code
+
+    def to_list(self) -> list[Optional[str]]:
+        """
+        转换为列表。
+        :return: list[Optional[str]]
+        """
+        lookup = self.categories + [None]
+        return [lookup[code] for code in self.codes.tolist()]
+
+    @staticmethod
+    def empty(size: int) -> 'CategoryColumn':
+        """
+        全为 None 的列。
+        :param size: 行数
+        :return: CategoryColumn
+        """
+        return CategoryColumn(np.full(size, -1, dtype=np.int32), [])
+
+    @staticmethod
+    def from_values(values: Iterable[Optional[str]]) -> 'CategoryColumn':
+        """
+        从取值序列构建。
+        :param values: 取值序列
+        :return: CategoryColumn
+        """
+        column = CategoryColumn(np.empty(0, dtype=np.int32), [])
+        column.codes = np.fromiter((column.code_of(value) for value in values), dtype=np.int32)
+        return column
+
+
+class ColumnarRoutePoint:
+    """
+    ColumnarRoute 中一个点的视图。读写属性时直接访问 ColumnarRoute 中的数组，不复制数据。
+    属性与 RoutePoint 相同，供按点处理的旧代码使用；需要 RoutePoint 对象时调用 to_route_point。
+    """
+    __slots__ = ('route', 'position')
+
+    def __init__(self, route: 'ColumnarRoute', position: int):
+        self.route = route
+        self.position = position
+
+    @property
+    def index(self) -> Optional[int]:
+        value = int(self.route.index[self.position])
+        return value if value >= 0 else None
+
+    @index.setter
+    def index(self, value: Optional[int]):
+        self.route.index[self.position] = value if value is not None else -1
+
+    @property
+    def time(self) -> Optional[datetime]:
+        return self.route.time_at(self.position)
+
+    @time.setter
+    def time(self, value: Optional[datetime]):
+        self.route.time[self.position] = self.route.to_datetime64(value)
+
+    def to_route_point(self) -> RoutePoint:
+        """
+        转换为 RoutePoint。
+        :return: RoutePoint
+        """
+        return RoutePoint(
+            index=self.index,
+            time=self.time,
+            **{field: getattr(self, field) for field in FLOAT_FIELDS + CATEGORY_FIELDS}
+        )
+
+    def to_json_dict_obj(self) -> dict[str, Any]:
+        """
+        转换为能够转为 JSON 字符串的字典类型，见 RoutePoint.to_json_dict_obj。
+        :return: dict[str, Any]
+        """
+        return self.to_route_point().to_json_dict_obj()
+
+    def to_csv_dict_obj(self) -> dict[str, Any]:
+        """
+        转换为能够转为 CSV 的字典类型，见 RoutePoint.to_csv_dict_obj。
+        :return: dict[str, Any]
+        """
+        return self.to_route_point().to_csv_dict_obj()
+
+    def __repr__(self):
+        return f'ColumnarRoutePoint({self.to_route_point()!r})'
+
+
+def _float_property(field: str) -> property:
+    def getter(self: ColumnarRoutePoint) -> Optional[float]:
+        value = getattr(self.route, field)[self.position]
+        return None if np.isnan(value) else float(value)
+
+    def setter(self: ColumnarRoutePoint, value: Optional[float]):
+        getattr(self.route, field)[self.position] = np.nan if value is None else value
+
+    return property(getter, setter)
+
+
+def _category_property(field: str) -> property:
+    def getter(self: ColumnarRoutePoint) -> Optional[str]:
+        return getattr(self.route, field)[self.position]
+
+    def setter(self: ColumnarRoutePoint, value: Optional[str]):
+        getattr(self.route, field)[self.position] = value
+
+    return property(getter, setter)
+
+
+for _field in FLOAT_FIELDS:
+    setattr(ColumnarRoutePoint, _field, _float_property(_field))
+for _field in CATEGORY_FIELDS:
+    setattr(ColumnarRoutePoint, _field, _category_property(_field))
+
+
+class ColumnarPointList(Sequence):
+    """
+    ColumnarRoute 的点列表，按需生成 ColumnarRoutePoint 视图。
+    """
+
+    def __init__(self, route: 'ColumnarRoute'):
+        self.route = route
+
+    def __len__(self):
+        return len(self.route)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [ColumnarRoutePoint(self.route, i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('point index out of range')
+        return ColumnarRoutePoint(self.route, position)
+
+
+class ColumnarRoute:
+    """
+    按列存储的行程。时间、坐标、高度、距离、方向、速度等存为 numpy 数组，行政区划、道路等字符串存为字典编码的列，
+    转换坐标、填写行政区划、导出时整列处理。
+    points 属性提供与 Route.points 兼容的按点访问方式；与 Route 之间可用 from_route、to_route 互相转换。
+    """
+
+    def __init__(
+            self, size: int,
+            coordinate_type: Optional[str] = None, transformed_coordinate_type: Optional[str] = None,
+            time_tz: Optional[tzinfo] = None
+    ):
+        """
+        创建 size 个点、所有字段均为空的行程。
+        :param size: 点数
+        :param coordinate_type: 原始类型
+        :param transformed_coordinate_type: 坐标转换后类型
+        :param time_tz: 时间的时区，为 None 时时间为无时区的 datetime
+        """
+        self.coordinate_type = coordinate_type
+        """原始类型"""
+
+        self.transformed_coordinate_type = transformed_coordinate_type
+        """坐标转换后类型"""
+
+        self.time_tz = time_tz
+        """时间的时区。time 数组统一以 UTC 存储，读出时转换到该时区"""
+
+        self.index = np.full(size, -1, dtype=np.int64)
+        """序号，-1 表示 None"""
+
+        self.time = np.full(size, _NAT, dtype='datetime64[us]')
+        """时间（UTC），NaT 表示 None"""
+
+        for field in FLOAT_FIELDS:
+            setattr(self, field, np.full(size, np.nan, dtype=np.float64))
+        for field in CATEGORY_FIELDS:
+            setattr(self, field, CategoryColumn.empty(size))
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def points(self) -> ColumnarPointList:
+        """
+        行程中的点
+        """
+        return ColumnarPointList(self)
+
+    def to_datetime64(self, value: Optional[datetime]) -> np.datetime64:
+        """
+        把 datetime 转换为 time 数组中存储的值。
+        :param value: datetime
+        :return: np.datetime64
+        """
+        if value is None:
+            return _NAT
+        if value.tzinfo is None:
+            microseconds = (value - _NAIVE_EPOCH) // timedelta(microseconds=1)
+        else:
+            microseconds = (value - _EPOCH) // timedelta(microseconds=1)
+        return np.datetime64(microseconds, 'us')
+
+    def time_at(self, position: int) -> Optional[datetime]:
+        """
+        读取第 position 个点的时间。
+        :param position: 位置
+        :return: datetime
+        """
+        value = self.time[position]
+        if np.isnat(value):
+            return None
+        delta = timedelta(microseconds=int(value.astype(np.int64)))
+        if self.time_tz is None:
+            return _NAIVE_EPOCH + delta
+        return (_EPOCH + delta).astimezone(self.time_tz)
+
+    def times(self) -> list[Optional[datetime]]:
+        """
+        所有点的时间。
+        :return: list[Optional[datetime]]
+        """
+        return [self.time_at(position) for position in range(len(self))]
+
+    def bounds(self) -> tuple[float, float, float, float]:
+        """
+        行程中所有点（原始坐标）的经纬度范围，可用于 GDFListHandler.area_index_for_bounds。
+        :return: (min_x, min_y, max_x, max_y)
+        """
+        return (
+            float(np.nanmin(self.longitude)), float(np.nanmin(self.latitude)),
+            float(np.nanmax(self.longitude)), float(np.nanmax(self.latitude))
+        )
+
+    @staticmethod
+    def from_route(route: Route) -> 'ColumnarRoute':
+        """
+        从 Route 转换。各点时间的时区以第一个有时间的点为准。
+        :param route: Route
+        :return: ColumnarRoute
+        """
+        points = route.points
+        time_tz = next((point.time.tzinfo for point in points if point.time is not None), None)
+        ret = ColumnarRoute(len(points), route.coordinate_type, route.transformed_coordinate_type, time_tz)
+        ret.index[:] = [point.index if point.index is not None else -1 for point in points]
+        ret.time[:] = [ret.to_datetime64(point.time) for point in points]
+        for field in FLOAT_FIELDS:
+            values = [getattr(point, field) for point in points]
+            getattr(ret, field)[:] = [float(value) if value is not None else np.nan for value in values]
+        for field in CATEGORY_FIELDS:
+            setattr(ret, field, CategoryColumn.from_values(getattr(point, field) for point in points))
+        return ret
+
+    def to_route(self) -> Route:
+        """
+        转换为 Route。
+        :return: Route
+        """
+        return Route(
+            points=[point.to_route_point() for point in self.points],
+            coordinate_type=self.coordinate_type,
+            transformed_coordinate_type=self.transformed_coordinate_type,
+        )
+
+    def transform_coordinate(self, force: bool = False, precise: bool = False):
+        """
+        转换坐标。转换结果放在 longitude_transformed、latitude_transformed 列
+        :param force: 对已经填写转换后坐标的点，是否覆盖内容
+        :param precise: 转换为 WGS84 时，是否迭代求精确结果，见 gpx_convert.convert_points
+        :return: None
+        """
+        if self.coordinate_type == self.transformed_coordinate_type:
+            return
+        if force:
+            positions = np.arange(len(self))
+        else:
+            positions = np.flatnonzero(np.isnan(self.longitude_transformed) | np.isnan(self.latitude_transformed))
+        if positions.size == 0:
+            return
+        longitudes, latitudes = convert_points(
+            self.longitude[positions], self.latitude[positions],
+            self.coordinate_type, self.transformed_coordinate_type, precise
+        )
+        self.longitude_transformed[positions] = longitudes
+        self.latitude_transformed[positions] = latitudes
+
+    def set_area(
+            self, area_gdf_list: list[GeoDataFrame] | AreaIndex, area_code_conn: sqlite3.Connection,
+            force: bool = False, incremental: bool = False, max_stride: int = 32
+    ):
+        """
+        填写行政区划。一次查询所有点所在的地区，再按行政区划代码整列写入名称，语义与 Route.set_area_batch 相同。
+        :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表，或由其构建的 AreaIndex
+        :param area_code_conn: 存放行政区划代码关系的 SQLite 数据库连接
+        :param force: 对已经填写地区的点，是否覆盖内容
+        :param incremental: 是否利用相邻点多在同一地区的特点，见 AreaIndex.query_run
+        :param max_stride: incremental == True 时，一次判断的最大点数，只影响速度
+        :return: None
+        """
+        if force:
+            positions = np.arange(len(self))
+        else:
+            positions = np.flatnonzero(
+                (self.province.codes < 0) | (self.city.codes < 0) | (self.area.codes < 0)
+            )
+        if positions.size == 0:
+            return
+        area_index = get_area_index(area_gdf_list)
+        longitudes = self.longitude[positions]
+        latitudes = self.latitude[positions]
+        if incremental:
+            area_ids = area_index.query_run(longitudes, latitudes, max_stride)
+        else:
+            area_ids = area_index.query_many(longitudes, latitudes)
+
+        # 按行政区划代码去重，每个地区只查一次代码表
+        unique_ids, inverse = np.unique(
+            np.array([area_id if area_id is not None else '' for area_id in area_ids], dtype=object),
+            return_inverse=True
+        )
+        area_code_table = get_area_code_table(area_code_conn)
+        area_infos = [area_code_table.get(area_id) if area_id != '' else None for area_id in unique_ids]
+        for name_field, en_field in _AREA_FIELDS:
+            name_column: CategoryColumn = getattr(self, name_field)
+            en_column: CategoryColumn = getattr(self, en_field)
+            name_codes = np.array([
+                name_column.code_of(getattr(info, name_field) if info is not None else None) for info in area_infos
+            ], dtype=np.int32)[inverse]
+            en_codes = np.array([
+                en_column.code_of(getattr(info, en_field) if info is not None else None) for info in area_infos
+            ], dtype=np.int32)[inverse]
+            # 与 RoutePoint.set_area_info 相同：名称变化时清空英文名称，代码表中有英文名称时写入
+            changed = name_column.codes[positions] != name_codes
+            en_column.codes[positions[changed]] = -1
+            has_en = en_codes >= 0
+            en_column.codes[positions[has_en]] = en_codes[has_en]
+            name_column.codes[positions] = name_codes
+
+    @staticmethod
+    def from_gpx_obj(
+            gpx: gpxpy.gpx.GPX, track_index: int = 0, segment_index: int = 0,
+            transform_coordinate: bool = False, coordinate_type: str = 'wgs84', transformed_coordinate_type: str = 'wgs84',
+            set_area: bool = False, area_gdf_list: list[GeoDataFrame] = None, area_code_conn: sqlite3.Connection = None
+    ) -> 'ColumnarRoute':
+        """
+        从 GPX 对象导入数据，参数与 Route.from_gpx_obj 相同。距离、速度、方向按列计算。
+        :param gpx: GPX 对象
+        :param track_index: track 序号
+        :param segment_index: segment 序号
+        :param transform_coordinate: 是否转换坐标
+        :param coordinate_type: 原坐标类型。transform_coordinate == True 时必填
+        :param transformed_coordinate_type: 转换后坐标类型。transform_coordinate == True 时必填
+        :param set_area: 是否填写行政区划
+        :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表。set_area == True 时必填
+        :param area_code_conn: 存放行政区划代码关系的 SQLite 数据库连接。set_area == True 时必填
+        :return: ColumnarRoute
+        """
+        segment = gpx.tracks[track_index].segments[segment_index]
+        return ColumnarRoute.from_gpx_arrays(
+            GPXPointArrays.from_gpx_segment(segment), transform_coordinate, coordinate_type, transformed_coordinate_type,
+            set_area, area_gdf_list, area_code_conn
+        )
+
+    @staticmethod
+    def from_gpx_arrays(
+            arrays: GPXPointArrays,
+            transform_coordinate: bool = False, coordinate_type: str = 'wgs84', transformed_coordinate_type: str = 'wgs84',
+            set_area: bool = False, area_gdf_list: list[GeoDataFrame] = None, area_code_conn: sqlite3.Connection = None
+    ) -> 'ColumnarRoute':
+        """
+        从一个 segment 的轨迹点数组导入数据，参数与 Route.from_gpx_arrays 相同
+        :return: ColumnarRoute
+        """
+        if transform_coordinate is True and (coordinate_type is None or transformed_coordinate_type is None):
+            raise AttributeError("transform_coordinate is True, but coordinate_type or transformed_coordinate_type is None")
+        if set_area is True and (area_gdf_list is None or area_code_conn is None):
+            raise AttributeError("set_area is True, but area_gdf_list or area_code_conn is None")
+        time_tz = next((time.tzinfo for time in arrays.time if time is not None), None)
+        ret = ColumnarRoute(len(arrays), coordinate_type, transformed_coordinate_type, time_tz)
+        if len(arrays) == 0:
+            return ret
+        ret.index[:] = np.arange(len(arrays))
+        ret.time[:] = [ret.to_datetime64(time) for time in arrays.time]
+        ret.longitude[:] = arrays.longitude
+        ret.latitude[:] = arrays.latitude
+        ret.elevation[:] = arrays.elevation
+        recorded_courses = arrays.course
+
+        # 经过的时间从第一个有时间的点算起，与 GPXPointArrays.elapsed_seconds 相同
+        has_time = ~np.isnat(ret.time)
+        seconds = np.full(len(ret), np.nan, dtype=np.float64)
+        if has_time.any():
+            first_time = ret.time[np.argmax(has_time)]
+            seconds[has_time] = (ret.time[has_time] - first_time).astype('timedelta64[us]').astype(np.float64) / 1e6
+        ret.elapsed_time[:] = np.fabs(seconds)
+        distances = calculate_distances(ret.latitude, ret.longitude, ret.elevation)
+        ret.distance[:] = np.cumsum(distances)
+        ret.speed[:] = calculate_speeds(distances, seconds)
+        ret.course[:] = calculate_courses(ret.latitude, ret.longitude, recorded_courses)
+
+        if transform_coordinate:
+            ret.transform_coordinate()
+        else:
+            ret.longitude_transformed[:] = ret.longitude
+            ret.latitude_transformed[:] = ret.latitude
+        if set_area:
+            ret.set_area(area_gdf_list, area_code_conn)
+        return ret
+
+    @staticmethod
+    def from_gpx_file(
+            gpx_file_path: str, track_index: int = 0, segment_index: int = 0,
+            transform_coordinate: bool = False, coordinate_type: str = None, transformed_coordinate_type: str = None,
+            set_area: bool = False, area_gdf_list: list[GeoDataFrame] = None, area_code_conn: sqlite3.Connection = None
+    ) -> 'ColumnarRoute':
+        """
+        从 GPX 文件导入数据，参数与 Route.from_gpx_file 相同
+        :return: ColumnarRoute
+        """
+        return ColumnarRoute.from_gpx_arrays(
+            read_gpx_segment(gpx_file_path, track_index, segment_index),
+            transform_coordinate, coordinate_type, transformed_coordinate_type, set_area, area_gdf_list, area_code_conn
+        )
+
+    def _column_lists(self) -> dict[str, list]:
+        """
+        把所有列转换为 Python 列表（缺失值为 None），供导出使用。
+        :return: dict[str, list]
+        """
+        columns: dict[str, list] = {
+            'index': [value if value >= 0 else None for value in self.index.tolist()],
+            'time': self.times(),
+        }
+        for field in FLOAT_FIELDS:
+            array = getattr(self, field)
+            columns[field] = np.where(np.isnan(array), None, array).tolist()
+        for field in CATEGORY_FIELDS:
+            columns[field] = getattr(self, field).to_list()
+        return columns
+
+    def to_gpx_obj(self, export_transformed_coordinate: bool = False) -> gpxpy.gpx.GPX:
+        """
+        导出为 GPX 对象
+        :param export_transformed_coordinate: 是否输出转换后的坐标
+        :return: gpxpy.gpx.GPX
+        """
+        columns = self._column_lists()
+        if export_transformed_coordinate:
+            lats, lons = columns['latitude_transformed'], columns['longitude_transformed']
+        else:
+            lats, lons = columns['latitude'], columns['longitude']
+        gpx = gpxpy.gpx.GPX()
+        gpx_track = gpxpy.gpx.GPXTrack()
+        gpx_segment = gpxpy.gpx.GPXTrackSegment()
+        gpx_segment.points = [
+            gpxpy.gpx.GPXTrackPoint(lat, lon, elevation=elevation, time=time, speed=speed)
+            for lat, lon, elevation, time, speed
+            in zip(lats, lons, columns['elevation'], columns['time'], columns['speed'])
+        ]
+        gpx_track.segments.append(gpx_segment)
+        gpx.tracks.append(gpx_track)
+        return gpx
+
+    def to_gpx_file(self, gpx_file_path: str, export_transformed_coordinate: bool = False):
+        """
+        导出为 GPX 文件
+        :param gpx_file_path: GPX 文件路径
+        :param export_transformed_coordinate: 是否输出转换后的坐标
+        :return: None
+        """
+        gpx = self.to_gpx_obj(export_transformed_coordinate)
+        with open(gpx_file_path, 'w', encoding='utf-8') as f:
+            f.write(gpx.to_xml())
+
+    def _json_point_columns(self) -> tuple[list[str], list[list]]:
+        columns = self._column_lists()
+        columns['time'] = [time.isoformat() if time is not None else None for time in columns['time']]
+        return list(columns.keys()), list(columns.values())
+
+    def to_json_dict_obj(self) -> dict[str, Any]:
+        """
+        转换为能够转为 JSON 字符串的字典类型，格式与 Route.to_json_dict_obj 相同。
+        :return: dict[str, Any]
+        """
+        names, values = self._json_point_columns()
+        return {
+            'points': [dict(zip(names, point_values)) for point_values in zip(*values)],
+            'coordinate_type': self.coordinate_type,
+            'transformed_coordinate_type': self.transformed_coordinate_type,
+        }
+
+    def _write_json(self, f: IO[str]):
+        names, values = self._json_point_columns()
+        json_util.dump_stream(f, 'points', (dict(zip(names, point_values)) for point_values in zip(*values)), {
+            'coordinate_type': self.coordinate_type,
+            'transformed_coordinate_type': self.transformed_coordinate_type,
+        })
+
+    def to_json(self) -> str:
+        """
+        转换为 JSON 字符串
+        :return: str
+        """
+        buf = io.StringIO()
+        self._write_json(buf)
+        return buf.getvalue()
+
+    def to_json_file(self, json_file: str | IO[str]):
+        """
+        转换为 JSON 文件，格式与 Route.to_json_file 相同，点逐个写出
+        :param json_file: JSON 文件路径，或以文本模式打开的文件
+        :return: None
+        """
+        if isinstance(json_file, str):
+            with open(json_file, 'w', encoding='utf-8') as f:
+                self._write_json(f)
+        else:
+            self._write_json(json_file)
+
+    def _time_tz_offset(self) -> Optional[int]:
+        """
+        时区相对 UTC 的偏移秒数，以第一个有时间的点为准；时间无时区时为 None
+        """
+        if self.time_tz is None:
+            return None
+        positions = np.flatnonzero(~np.isnat(self.time))
+        utc_offset = self.time_at(positions[0]).utcoffset() if positions.size > 0 else self.time_tz.utcoffset(None)
+        return int(utc_offset.total_seconds()) if utc_offset is not None else 0
+
+    def to_binary_file(self, binary_file_path: str):
+        """
+        导出为二进制行程文件，格式见 route_binary。各字符串列共用一个字符串表
+        :param binary_file_path: 文件路径
+        :return: None
+        """
+        strings: list[str] = []
+        string_codes: dict[str, int] = {}
+        columns: dict[str, np.ndarray] = {'index': self.index, 'time': self.time}
+        for field in FLOAT_FIELDS:
+            columns[field] = getattr(self, field)
+        for field in CATEGORY_FIELDS:
+            column: CategoryColumn = getattr(self, field)
+            lookup = []
+            for category in column.categories:
+                code = string_codes.get(category)
+                if code is None:
+                    code = string_codes[category] = len(strings)
+                    strings.append(category)
+                lookup.append(code)
+            # 末尾的 -1 对应 codes 中的 -1
+            columns[field] = np.array(lookup + [-1], dtype=np.int32)[column.codes]
+        with open(binary_file_path, 'wb') as f:
+            write_route_binary(
+                f, len(self), columns, strings, self.coordinate_type, self.transformed_coordinate_type,
+                self._time_tz_offset()
+            )
+
+    @staticmethod
+    def from_binary_file(binary_file_path: str, mmap: bool = True) -> 'ColumnarRoute':
+        """
+        从二进制行程文件导入
+        :param binary_file_path: 文件路径
+        :param mmap: 是否以 numpy.memmap 打开各列。为 True 时打开文件几乎不耗时，数据在访问时才从磁盘读入；
+                     修改数组（如转换坐标）不会写回文件
+        :return: ColumnarRoute
+        """
+        content = read_route_binary(binary_file_path, mmap)
+        time_tz = None
+        if content.time_tz_offset is not None:
+            time_tz = timezone(timedelta(seconds=content.time_tz_offset)) if content.time_tz_offset else timezone.utc
+        ret = ColumnarRoute(0, content.coordinate_type, content.transformed_coordinate_type, time_tz)
+        columns = content.columns
+        ret.index = columns['index'] if 'index' in columns else np.full(content.size, -1, dtype=np.int64)
+        ret.time = columns['time'] if 'time' in columns else np.full(content.size, _NAT, dtype='datetime64[us]')
+        for field in FLOAT_FIELDS:
+            setattr(ret, field, columns[field] if field in columns else np.full(content.size, np.nan, dtype=np.float64))
+        for field in CATEGORY_FIELDS:
+            if field in columns:
+                setattr(ret, field, CategoryColumn(columns[field], list(content.strings)))
+            else:
+                setattr(ret, field, CategoryColumn.empty(content.size))
+        return ret
+
+    def to_arrow_table(self) -> 'pa.Table':
+        """
+        转换为 Arrow 表。时间为带时区的 timestamp[us]，数值为 float64，字符串为字典编码，缺失值均为 null；
+        坐标类型存放在 schema 的元数据中。没有缺失值的数值列不复制数据
+        :return: pyarrow.Table
+        """
+        if pa is None:
+            raise ImportError('导出 Arrow、Parquet 需要安装 pyarrow')
+        time_tz_offset = self._time_tz_offset()
+        if time_tz_offset is None:
+            time_type = pa.timestamp('us')
+        elif getattr(self.time_tz, 'key', None) is not None:
+            # zoneinfo.ZoneInfo 等有名称的时区
+            time_type = pa.timestamp('us', tz=self.time_tz.key)
+        elif time_tz_offset == 0:
+            time_type = pa.timestamp('us', tz='UTC')
+        else:
+            sign = '+' if time_tz_offset >= 0 else '-'
+            hours, minutes = divmod(abs(time_tz_offset) // 60, 60)
+            time_type = pa.timestamp('us', tz=f'{sign}{hours:02d}:{minutes:02d}')
+        arrays = {
+            'index': pa.array(self.index, mask=self.index < 0),
+            'time': pa.array(self.time.astype(np.int64), type=pa.int64(), mask=np.isnat(self.time)).cast(time_type),
+        }
+        for field in FLOAT_FIELDS:
+            array = np.asarray(getattr(self, field))
+            mask = np.isnan(array)
+            arrays[field] = pa.array(array, mask=mask) if mask.any() else pa.array(array)
+        for field in CATEGORY_FIELDS:
+            column: CategoryColumn = getattr(self, field)
+            codes = np.asarray(column.codes)
+            arrays[field] = pa.DictionaryArray.from_arrays(
+                pa.array(codes, mask=codes < 0), pa.array(column.categories, type=pa.string())
+            )
+        metadata = {
+            key: value for key, value in (
+                ('coordinate_type', self.coordinate_type),
+                ('transformed_coordinate_type', self.transformed_coordinate_type),
+            ) if value is not None
+        }
+        return pa.table(arrays, metadata=metadata)
+
+    @staticmethod
+    def from_arrow_table(table: 'pa.Table') -> 'ColumnarRoute':
+        """
+        从 Arrow 表导入，列的格式见 to_arrow_table。缺少的列为空；字符串列不是字典编码时会先编码
+        :param table: pyarrow.Table
+        :return: ColumnarRoute
+        """
+        metadata = {key.decode('utf-8'): value.decode('utf-8') for key, value in (table.schema.metadata or {}).items()}
+        time_tz = None
+        if 'time' in table.column_names:
+            tz_name = table.schema.field('time').type.tz
+            if tz_name is not None:
+                time_tz = _tzinfo_from_name(tz_name)
+        ret = ColumnarRoute(
+            0, metadata.get('coordinate_type'), metadata.get('transformed_coordinate_type'), time_tz
+        )
+        size = table.num_rows
+        table = table.unify_dictionaries()
+
+        def column(name: str) -> Optional['pa.Array']:
+            if name not in table.column_names:
+                return None
+            return table.column(name).combine_chunks()
+
+        index = column('index')
+        # to_numpy 可能直接引用 Arrow 的只读内存，这里都复制为可写的数组，导入后可以修改
+        ret.index = np.array(index.fill_null(-1).to_numpy(), dtype=np.int64) if index is not None \
+            else np.full(size, -1, dtype=np.int64)
+        time = column('time')
+        if time is not None:
+            # 其他来源的表可能使用其他单位（如 pandas 默认的 ns），先统一转换为 us，不足 1 us 的部分截去
+            time = time.cast(pa.timestamp('us', tz=table.schema.field('time').type.tz), safe=False)
+            ret.time = np.array(time.cast(pa.int64()).to_numpy(zero_copy_only=False), dtype=np.int64).view('datetime64[us]')
+            ret.time[time.is_null().to_numpy(zero_copy_only=False)] = _NAT
+        else:
+            ret.time = np.full(size, _NAT, dtype='datetime64[us]')
+        for field in FLOAT_FIELDS:
+            array = column(field)
+            if array is None:
+                setattr(ret, field, np.full(size, np.nan, dtype=np.float64))
+            elif array.null_count == 0:
+                setattr(ret, field, np.array(array.to_numpy(), dtype=np.float64))
+            else:
+                setattr(ret, field, np.array(array.cast(pa.float64()).fill_null(np.nan).to_numpy(), dtype=np.float64))
+        for field in CATEGORY_FIELDS:
+            array = column(field)
+            if array is None:
+                setattr(ret, field, CategoryColumn.empty(size))
+                continue
+            if not pa.types.is_dictionary(array.type):
+                array = array.dictionary_encode()
+            setattr(ret, field, CategoryColumn(
+                array.indices.fill_null(-1).to_numpy().astype(np.int32), array.dictionary.to_pylist()
+            ))
+        return ret
+
+    def to_parquet(self, parquet_file_path: str, compression: str = 'zstd'):
+        """
+        导出为 Parquet 文件，列的格式见 to_arrow_table
+        :param parquet_file_path: 文件路径
+        :param compression: 压缩方式，见 pyarrow.parquet.write_table
+        :return: None
+        """
+        if pq is None:
+            raise ImportError('导出 Parquet 需要安装 pyarrow')
+        pq.write_table(self.to_arrow_table(), parquet_file_path, compression=compression)
+
+    @staticmethod
+    def from_parquet(parquet_file_path: str, columns: Optional[list[str]] = None) -> 'ColumnarRoute':
+        """
+        从 Parquet 文件导入
+        :param parquet_file_path: 文件路径
+        :param columns: 只读取这些列，为 None 时读取全部。未读取的列为空
+        :return: ColumnarRoute
+        """
+        if pq is None:
+            raise ImportError('导入 Parquet 需要安装 pyarrow')
+        return ColumnarRoute.from_arrow_table(pq.read_table(parquet_file_path, columns=columns, memory_map=True))
+
+    def to_csv(self, csv_file_path: str):
+        """
+        将点转换为 CSV 格式的文件，格式与 Route.to_csv 相同。
+        为确保文件能够直接被 Excel 等表格软件打开，指定编码为带 BOM 的 UTF-8
+        """
+        columns = self._column_lists()
+        times = columns.pop('time')
+        columns = {
+            'index': columns.pop('index'),
+            'time_date': [time.date().strftime('%Y/%m/%d') if time is not None else None for time in times],
+            'time_time': [time.time().strftime('%H:%M:%S') if time is not None else None for time in times],
+            'time_microsecond': [time.time().microsecond if time is not None else None for time in times],
+            **columns,
+        }
+        csv_util.write_csv_rows(csv_file_path, list(columns.keys()), zip(*columns.values()), encoding='utf-8-sig')
+
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    test_route = ColumnarRoute.from_gpx_file(
+        './test/gpx_sample/from_gps_logger.gpx',
+        transform_coordinate=True, coordinate_type='wgs84', transformed_coordinate_type='gcj02'
+    )
+    with tempfile.TemporaryDirectory() as temp_dir:
+        parquet_path = os.path.join(temp_dir, 'from_gps_logger.parquet')
+        test_route.to_parquet(parquet_path)
+        test_route_from_parquet = ColumnarRoute.from_parquet(parquet_path)
+    # 从 Parquet 导入的行程可以直接修改
+    test_route_from_parquet.transform_coordinate(force=True)
+    test_route_from_parquet.points[0].elevation = 3.0
+    test_route_from_parquet.points[0].index = 3
+    assert test_route_from_parquet.elevation[0] == 3.0 and test_route_from_parquet.index[0] == 3
+    print(len(test_route_from_parquet), test_route_from_parquet.points[0])
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 
 @dataclass
 class PositionConfig:
@@ -135,6 +135,20 @@ class TrafficSignConfig:
 class AreaInfoConfig:
     gdf_dir_path: str
     area_info_sqlite_path: str
+    cache_dir_path: Optional[str] = None
+    """存放由行政区划 GeoJSON 生成的缓存文件（二进制缓存、查找网格）的目录。为空时不缓存"""
+    grid_cell_size: Optional[float] = None
+    """行政区划查找网格的单元格边长，单位为度。为空时不使用网格"""
+    lazy_load: bool = False
+    """是否按需加载各地区的 GeoJSON 文件"""
+    lazy_load_memory_limit_mb: Optional[float] = None
+    """按需加载时，已加载的 GeoJSON 占用内存的上限（MB）。为空时不限制"""
+    lazy_load_index_cache_size: int = 16
+    """按需加载时，按文件组合缓存的 AreaIndex 的最大个数"""
+    lookup_cache_cell_size: Optional[float] = None
+    """行政区划查询结果缓存的单元格边长，单位为度。为空时不缓存"""
+    lookup_cache_max_size: int = 100000
+    """行政区划查询结果缓存在进程内最多保存的单元格数"""
 
 @dataclass
 class VideoInfoLayerFontPathConfig:
@@ -1,25 +1,53 @@
-import json
+import io
 import sqlite3
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, Any
+from functools import partial
+from itertools import groupby
+from typing import Optional, Any, IO, Iterator
 
 import gpxpy
+import numpy as np
 from geopandas import GeoDataFrame
 from shapely.geometry.point import Point
 from tqdm import tqdm
 
-from ..utils import csv_util
-from ..utils.data_type_processor import process_or_none, float_or_none
+from ..utils import csv_util, json_util
+from ..utils.area_code_table import AreaInfo, get_area_code_table
+from ..utils.area_index import AreaIndex, get_area_index
+from ..utils.data_type_processor import process_or_none, float_or_none, intern_or_none
 from ..utils.datetime_util import datetime_yyyymmdd_slash_time_microsecond_tz
 from ..utils.db_connect import AreaCodeConnectHandler
 from ..utils.gdf_handler import GDFListHandler
-from ..utils.process import threaded_map_list, threaded_map
-from ..utils.route_util import calculate_bearing, get_area_info
-from ..utils.gpx_convert import convert_single_point
-
-
-@dataclass
+from ..utils.process import threaded_map_list, threaded_map, process_map_list
+from ..utils.route_util import get_area_info_by_id, calculate_distances, calculate_speeds, calculate_courses, \
+    to_optional_list
+from ..utils.gpx_reader import GPXPointArrays, read_gpx_segment, iter_gpx_segments
+from ..utils.gpx_convert import convert_single_point, convert_points
+
+
+CSV_FIELDS = (
+    'index', 'time_date', 'time_time', 'time_microsecond', 'elapsed_time', 'longitude', 'latitude',
+    'longitude_transformed', 'latitude_transformed', 'elevation', 'distance', 'course', 'speed',
+    'province', 'city', 'area', 'province_en', 'city_en', 'area_en', 'road_num', 'road_name', 'road_name_en', 'memo',
+)
+"""CSV 文件的列"""
+
+CSV_PARSERS = {
+    'index': int, 'time_date': None, 'time_time': None, 'time_microsecond': int,
+    'elapsed_time': float, 'longitude': float, 'latitude': float,
+    'longitude_transformed': float, 'latitude_transformed': float,
+    'elevation': float, 'distance': float, 'course': float, 'speed': float,
+    'province': sys.intern, 'city': sys.intern, 'area': sys.intern,
+    'province_en': sys.intern, 'city_en': sys.intern, 'area_en': sys.intern,
+    'road_num': sys.intern, 'road_name': sys.intern, 'road_name_en': sys.intern,
+    'memo': None,
+}
+"""读取 CSV 时各列的解析函数，见 csv_util.iter_csv_rows"""
+
+
+@dataclass(slots=True)
 class RoutePoint:
     """
     行程的点
@@ -92,29 +120,53 @@ class RoutePoint:
     memo: Optional[str] = None
     """备注"""
 
-    def set_area(self, area_gdf_list: list[GeoDataFrame], area_code_conn: sqlite3.Connection, force: bool = False):
+    def set_area(self, area_gdf_list: list[GeoDataFrame] | AreaIndex, area_code_conn: sqlite3.Connection, force: bool = False):
         """
-        填写行政区划。目前的做法是：加载各地区的 geojson 文件（area_gdf_list），判断点属于哪个地区的，得到代码，在给定的 SQLite 文件中找到对应代码的行政区划。
-        :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表
+        填写行政区划。目前的做法是：加载各地区的 geojson 文件（area_gdf_list），判断点属于哪个地区的，得到代码，在行政区划代码表（由给定的 SQLite 文件加载）中找到对应代码的行政区划。
+        :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表，或由其构建的 AreaIndex
         :param area_code_conn: 存放行政区划代码关系的 SQLite 数据库连接
         :param force: 对已经填写地区的点，是否覆盖内容
         :return: None
         """
         if self.province is not None and self.city is not None and self.area is not None and not force:
             return
-        area_info = get_area_info(Point(self.longitude, self.latitude), area_gdf_list, area_code_conn)
-        province_result = area_info[0] if area_info is not None else None
-        city_result = area_info[1] if area_info is not None else None
-        area_result = area_info[2] if area_info is not None else None
-        if self.province != province_result:
+        area_id = get_area_index(area_gdf_list).query(Point(self.longitude, self.latitude))
+        self.set_area_info(get_area_code_table(area_code_conn).get(area_id) if area_id is not None else None)
+
+    def set_area_names(self, province: Optional[str], city: Optional[str], area: Optional[str]):
+        """
+        写入行政区划名称。名称有变化时，清空对应的英文名称。
+        :param province: 省
+        :param city: 市
+        :param area: 县/区
+        :return: None
+        """
+        if self.province != province:
             self.province_en = None
-        if self.city != city_result:
+        if self.city != city:
             self.city_en = None
-        if self.area != area_result:
+        if self.area != area:
             self.area_en = None
-        self.province = province_result
-        self.city = city_result
-        self.area = area_result
+        self.province = intern_or_none(province)
+        self.city = intern_or_none(city)
+        self.area = intern_or_none(area)
+
+    def set_area_info(self, area_info: Optional[AreaInfo]):
+        """
+        根据行政区划代码表中的一条记录写入行政区划名称，记录中有英文名称时一并写入。
+        :param area_info: 行政区划代码表中的记录，为 None 时表示不在任何已知区域内
+        :return: None
+        """
+        if area_info is None:
+            self.set_area_names(None, None, None)
+            return
+        self.set_area_names(area_info.province, area_info.city, area_info.area)
+        if area_info.province_en is not None:
+            self.province_en = intern_or_none(area_info.province_en)
+        if area_info.city_en is not None:
+            self.city_en = intern_or_none(area_info.city_en)
+        if area_info.area_en is not None:
+            self.area_en = intern_or_none(area_info.area_en)
 
     def transform_coordinate(self, coordinate_type, transformed_coordinate_type, force: bool = False):
         """
@@ -159,37 +211,46 @@ class RoutePoint:
             "memo": self.memo,
         }
 
+    def to_csv_row(self) -> tuple:
+        """
+        转换为 CSV 的一行，各值的顺序与 CSV_FIELDS 相同，缺失值为 None。
+        其中的日期和时间（时分秒）和毫秒会分开存储，以避免表格软件对时间的格式化损失数据。
+        :return: tuple
+        """
+        time = self.time
+        return (
+            self.index,
+            f'{time.year:04d}/{time.month:02d}/{time.day:02d}' if time is not None else None,
+            f'{time.hour:02d}:{time.minute:02d}:{time.second:02d}' if time is not None else None,
+            time.microsecond if time is not None else None,
+            self.elapsed_time,
+            self.longitude,
+            self.latitude,
+            self.longitude_transformed,
+            self.latitude_transformed,
+            self.elevation,
+            self.distance,
+            self.course,
+            self.speed,
+            self.province,
+            self.city,
+            self.area,
+            self.province_en,
+            self.city_en,
+            self.area_en,
+            self.road_num,
+            self.road_name,
+            self.road_name_en,
+            self.memo,
+        )
+
     def to_csv_dict_obj(self) -> dict[str, Any]:
         """
         转换为能够转为 CSV 的字典类型，供转为 CSV，在诸如 Excel 的软件里面使用。
         其中的日期和时间（时分秒）和毫秒会分开存储，以避免表格软件对时间的格式化损失数据。
         :return: dict[str, Any]
         """
-        return {
-            "index": self.index if self.index is not None else '',
-            "time_date": self.time.date().strftime('%Y/%m/%d') if self.time is not None else '',
-            "time_time": self.time.time().strftime('%H:%M:%S') if self.time is not None else '',
-            "time_microsecond": self.time.time().microsecond if self.time is not None else '',
-            "elapsed_time": self.elapsed_time if self.elapsed_time is not None else '',
-            "longitude": self.longitude if self.longitude is not None else '',
-            "latitude": self.latitude if self.latitude is not None else '',
-            "longitude_transformed": self.longitude_transformed if self.longitude_transformed is not None else '',
-            "latitude_transformed": self.latitude_transformed if self.latitude_transformed is not None else '',
-            "elevation": self.elevation if self.elevation is not None else '',
-            "distance": self.distance if self.distance is not None else '',
-            "course": self.course if self.course is not None else '',
-            "speed": self.speed if self.speed is not None else '',
-            "province": self.province if self.province is not None else '',
-            "city": self.city if self.city is not None else '',
-            "area": self.area if self.area is not None else '',
-            "province_en": self.province_en if self.province_en is not None else '',
-            "city_en": self.city_en if self.city_en is not None else '',
-            "area_en": self.area_en if self.area_en is not None else '',
-            "road_num": self.road_num if self.road_num is not None else '',
-            "road_name": self.road_name if self.road_name is not None else '',
-            "road_name_en": self.road_name_en if self.road_name_en is not None else '',
-            "memo": self.memo if self.memo is not None else '',
-        }
+        return {name: value if value is not None else '' for name, value in zip(CSV_FIELDS, self.to_csv_row())}
 
 
     @staticmethod
@@ -211,15 +272,15 @@ class RoutePoint:
             distance=float_or_none(json_dict_obj["distance"]),
             course=float_or_none(json_dict_obj["course"]),
             speed=float_or_none(json_dict_obj["speed"]),
-            province=json_dict_obj["province"],
-            city=json_dict_obj["city"],
-            area=json_dict_obj["area"],
-            province_en=json_dict_obj["province_en"],
-            city_en=json_dict_obj["city_en"],
-            area_en=json_dict_obj["area_en"],
-            road_num=json_dict_obj["road_num"],
-            road_name=json_dict_obj["road_name"],
-            road_name_en=json_dict_obj["road_name_en"],
+            province=intern_or_none(json_dict_obj["province"]),
+            city=intern_or_none(json_dict_obj["city"]),
+            area=intern_or_none(json_dict_obj["area"]),
+            province_en=intern_or_none(json_dict_obj["province_en"]),
+            city_en=intern_or_none(json_dict_obj["city_en"]),
+            area_en=intern_or_none(json_dict_obj["area_en"]),
+            road_num=intern_or_none(json_dict_obj["road_num"]),
+            road_name=intern_or_none(json_dict_obj["road_name"]),
+            road_name_en=intern_or_none(json_dict_obj["road_name_en"]),
             memo=json_dict_obj["memo"],
         )
 
@@ -244,18 +305,56 @@ class RoutePoint:
             distance=float_or_none(csv_dict_obj["distance"]),
             course=float_or_none(csv_dict_obj["course"]),
             speed=float_or_none(csv_dict_obj["speed"]),
-            province=csv_dict_obj["province"],
-            city=csv_dict_obj["city"],
-            area=csv_dict_obj["area"],
-            province_en=csv_dict_obj["province_en"],
-            city_en=csv_dict_obj["city_en"],
-            area_en=csv_dict_obj["area_en"],
-            road_num=csv_dict_obj["road_num"],
-            road_name=csv_dict_obj["road_name"],
-            road_name_en=csv_dict_obj["road_name_en"],
+            province=intern_or_none(csv_dict_obj["province"]),
+            city=intern_or_none(csv_dict_obj["city"]),
+            area=intern_or_none(csv_dict_obj["area"]),
+            province_en=intern_or_none(csv_dict_obj["province_en"]),
+            city_en=intern_or_none(csv_dict_obj["city_en"]),
+            area_en=intern_or_none(csv_dict_obj["area_en"]),
+            road_num=intern_or_none(csv_dict_obj["road_num"]),
+            road_name=intern_or_none(csv_dict_obj["road_name"]),
+            road_name_en=intern_or_none(csv_dict_obj["road_name_en"]),
             memo=csv_dict_obj["memo"],
         )
 
+    @staticmethod
+    def from_csv_row(row: tuple) -> 'RoutePoint':
+        """
+        从 csv_util.iter_csv_rows 按 CSV_PARSERS 解析出的一行转换。
+        :param row: 各值的顺序与 CSV_FIELDS 相同
+        :return: RoutePoint
+        """
+        (
+            index, time_date, time_time, time_microsecond, elapsed_time, longitude, latitude,
+            longitude_transformed, latitude_transformed, elevation, distance, course, speed,
+            province, city, area, province_en, city_en, area_en, road_num, road_name, road_name_en, memo
+        ) = row
+        return RoutePoint(
+            index=index,
+            time=datetime_yyyymmdd_slash_time_microsecond_tz(time_date, time_time, microsecond=time_microsecond)
+                    if time_date is not None and time_time is not None and time_microsecond is not None
+                    else None,
+            elapsed_time=elapsed_time,
+            longitude=longitude,
+            latitude=latitude,
+            longitude_transformed=longitude_transformed,
+            latitude_transformed=latitude_transformed,
+            elevation=elevation,
+            distance=distance,
+            course=course,
+            speed=speed,
+            province=province,
+            city=city,
+            area=area,
+            province_en=province_en,
+            city_en=city_en,
+            area_en=area_en,
+            road_num=road_num,
+            road_name=road_name,
+            road_name_en=road_name_en,
+            memo=memo,
+        )
+
 
 @dataclass
 class Route:
@@ -271,20 +370,46 @@ class Route:
     transformed_coordinate_type: Optional[str] = None
     """坐标转换后类型"""
 
-    def transform_coordinate(self, force: bool = False):
+    segment_starts: list[int] = field(default_factory=list)
+    """由多个 segment 合并而成时，各 segment 第一个点在 points 中的位置；为空表示只有一段"""
+
+    def bounds(self) -> tuple[float, float, float, float]:
+        """
+        行程中所有点（原始坐标）的经纬度范围，可用于 GDFListHandler.area_index_for_bounds。
+        :return: (min_x, min_y, max_x, max_y)
+        """
+        longitudes = [float(point.longitude) for point in self.points]
+        latitudes = [float(point.latitude) for point in self.points]
+        return min(longitudes), min(latitudes), max(longitudes), max(latitudes)
+
+    def transform_coordinate(self, force: bool = False, precise: bool = False):
         """
         转换坐标。转换结果放在 各个点的 longitude_transformed、latitude_transformed
         :param force: 对已经填写转换后坐标的点，是否覆盖内容
+        :param precise: 转换为 WGS84 时，是否迭代求精确结果，见 gpx_convert.convert_points
         :return: None
         """
         # list(map(lambda point: point.transform_coordinate(coordinate_type, transformed_coordinate_type, force), self.points))
-        for point in tqdm(self.points, total=len(self.points), desc="Transform Coordinate", unit='point(s)'):
-            point.transform_coordinate(self.coordinate_type, self.transformed_coordinate_type, force)
+        if self.coordinate_type == self.transformed_coordinate_type:
+            return
+        points = self.points if force else [
+            point for point in self.points
+            if point.longitude_transformed is None or point.latitude_transformed is None
+        ]
+        if len(points) == 0:
+            return
+        longitudes, latitudes = convert_points(
+            [float(point.longitude) for point in points], [float(point.latitude) for point in points],
+            self.coordinate_type, self.transformed_coordinate_type, precise
+        )
+        for point, longitude, latitude in zip(points, longitudes.tolist(), latitudes.tolist()):
+            point.longitude_transformed = longitude
+            point.latitude_transformed = latitude
 
-    def set_area(self, area_gdf_list: list[GeoDataFrame], area_code_conn: sqlite3.Connection, force: bool = False):
+    def set_area(self, area_gdf_list: list[GeoDataFrame] | AreaIndex, area_code_conn: sqlite3.Connection, force: bool = False):
         """
         填写行政区划。目前的做法是：加载各地区的 geojson 文件（area_gdf_list），判断点属于哪个地区的，得到编码，在给定的 SQLite 文件中找到对应编码的行政区划。
-        :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表
+        :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表，或由其构建的 AreaIndex
         :param area_code_conn: 存放行政区划代码关系的 SQLite 数据库连接
         :param force: 对已经填写地区的点，是否覆盖内容
         :return: None
@@ -292,12 +417,46 @@ class Route:
         # list(map(lambda point: point.set_area(area_gdf_list, area_code_conn, force), self.points))
         # for point in tqdm(self.points, total=len(self.points), desc="Set Area", unit='point(s)'):
         #     point.set_area(area_gdf_list, area_code_conn, force)
+        area_index = get_area_index(area_gdf_list)
+
         @threaded_map(desc="Set Area", unit='point(s)')
         def point_set_area(point: RoutePoint):
-            point.set_area(area_gdf_list, area_code_conn, force)
+            point.set_area(area_index, area_code_conn, force)
 
         point_set_area(self.points)
 
+    def set_area_batch(
+            self, area_gdf_list: list[GeoDataFrame] | AreaIndex, area_code_conn: sqlite3.Connection, force: bool = False,
+            incremental: bool = False, max_stride: int = 32
+    ):
+        """
+        批量填写行政区划。将所有点的坐标组成一个数组，一次性在空间索引中查询所在地区，
+        再从行政区划代码表中查出名称，最后统一写回各点。
+        不在任何已知区域内的点，行政区划清空为 None（与此处的 set_area 相同；dto 中的 set_area 对这样的点会抛出异常）。
+        :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表，或由其构建的 AreaIndex
+        :param area_code_conn: 存放行政区划代码关系的 SQLite 数据库连接
+        :param force: 对已经填写地区的点，是否覆盖内容
+        :param incremental: 是否按轨迹顺序增量查询：只在跨越地区边界处做完整查询，其余点只与上一个点所在的多边形比较。见 AreaIndex.query_index_run
+        :param max_stride: 增量查询时一次判断的最大点数，只影响速度
+        :return: None
+        """
+        points = [
+            point for point in self.points
+            if force or point.province is None or point.city is None or point.area is None
+        ]
+        if not points:
+            return
+        area_index = get_area_index(area_gdf_list)
+        longitudes = [point.longitude for point in points]
+        latitudes = [point.latitude for point in points]
+        if incremental:
+            area_ids = area_index.query_run(longitudes, latitudes, max_stride)
+        else:
+            area_ids = area_index.query_many(longitudes, latitudes)
+        area_code_table = get_area_code_table(area_code_conn)
+        for point, area_id in zip(points, area_ids):
+            point.set_area_info(area_code_table.get(area_id) if area_id is not None else None)
+
     @staticmethod
     def from_gpx_obj(
             gpx: gpxpy.gpx.GPX, track_index: int = 0, segment_index: int = 0,
@@ -317,64 +476,81 @@ class Route:
         :param area_code_conn: 存放行政区划代码关系的 SQLite 数据库连接。set_area == True 时必填
         :return: Route
         """
+        segment = gpx.tracks[track_index].segments[segment_index]
+        return Route.from_gpx_arrays(
+            GPXPointArrays.from_gpx_segment(segment), transform_coordinate, coordinate_type, transformed_coordinate_type,
+            set_area, area_gdf_list, area_code_conn
+        )
+
+    @staticmethod
+    def from_gpx_arrays(
+            arrays: GPXPointArrays,
+            transform_coordinate: bool = False, coordinate_type: str = 'wgs84', transformed_coordinate_type: str = 'wgs84',
+            set_area: bool = False, area_gdf_list: list[GeoDataFrame] = None, area_code_conn: sqlite3.Connection = None
+    ) -> 'Route':
+        """
+        从一个 segment 的轨迹点数组导入数据，距离、速度、方向整列计算
+        :param arrays: 轨迹点数组，由 gpx_reader.read_gpx_segment 读取或由 GPXPointArrays.from_gpx_segment 提取
+        :param transform_coordinate: 是否转换坐标
+        :param coordinate_type: 原坐标类型。transform_coordinate == True 时必填
+        :param transformed_coordinate_type: 转换后坐标类型。transform_coordinate == True 时必填
+        :param set_area: 是否填写行政区划
+        :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表。set_area == True 时必填
+        :param area_code_conn: 存放行政区划代码关系的 SQLite 数据库连接。set_area == True 时必填
+        :return: Route
+        """
         if transform_coordinate is True and (coordinate_type is None or transformed_coordinate_type is None):
             raise AttributeError("transform_coordinate is True, but coordinate_type or transformed_coordinate_type is None")
         if set_area is True and (area_gdf_list is None or area_code_conn is None):
             raise AttributeError("set_area is True, but area_gdf_list or area_code_conn is None")
-        segment = gpx.tracks[track_index].segments[segment_index]
-        first_point = segment.points[0]
-        course = 0
-        total_distance = 0
-        ret_list: list[RoutePoint] = []
+        longitudes = arrays.longitude
+        latitudes = arrays.latitude
+        seconds = arrays.elapsed_seconds()
+
+        distances = calculate_distances(latitudes, longitudes, arrays.elevation)
+        total_distances = np.cumsum(distances).tolist()
+        elapsed_times = to_optional_list(np.fabs(seconds))
+        speeds = to_optional_list(calculate_speeds(distances, seconds))
+        courses = calculate_courses(latitudes, longitudes, arrays.course).tolist()
+        elevations = to_optional_list(arrays.elevation)
+        if transform_coordinate:
+            transformed_longitudes, transformed_latitudes = convert_points(
+                longitudes, latitudes, coordinate_type, transformed_coordinate_type
+            )
+            transformed_longitudes = transformed_longitudes.tolist()
+            transformed_latitudes = transformed_latitudes.tolist()
+        else:
+            transformed_longitudes = longitudes.tolist()
+            transformed_latitudes = latitudes.tolist()
+        if set_area:
+            area_ids = get_area_index(area_gdf_list).query_many(longitudes, latitudes)
+            area_infos = [
+                get_area_info_by_id(area_id, area_code_conn) if area_id is not None else None for area_id in area_ids
+            ]
+        else:
+            area_infos = [None] * len(arrays)
 
-        for index, point in tqdm(enumerate(segment.points), total=len(segment.points), desc="Processing GPX Points",
-                                 unit='point(s)'):
-            if transform_coordinate:
-                transformed_coordinate = convert_single_point(point.longitude, point.latitude,
-                                                              coordinate_type,
-                                                              transformed_coordinate_type)
-            else:
-                transformed_coordinate = (point.longitude, point.latitude)
-            if set_area:
-                area_info = get_area_info(Point(point.longitude, point.latitude), area_gdf_list, area_code_conn)
-                province_result = area_info[0] if area_info is not None else None
-                city_result = area_info[1] if area_info is not None else None
-                area_result = area_info[2] if area_info is not None else None
-            else:
-                province_result = None
-                city_result = None
-                area_result = None
-            if index > 0:
-                # distance = calculate_distance(segment.points[index - 1], point)
-                prev_point = segment.points[index - 1]
-                distance = point.distance_3d(prev_point)
-                speed = distance / point.time_difference(prev_point)
-                if point.course:
-                    course = point.course
-                else:
-                    course_tmp = calculate_bearing(prev_point, point)
-                    if course_tmp != 0:
-                        course = course_tmp
-                total_distance += distance
-            else:
-                distance = 0
-                speed = 0
-                course = 0
+        ret_list: list[RoutePoint] = []
+        for index, (longitude, latitude, time) in tqdm(
+                enumerate(zip(longitudes.tolist(), latitudes.tolist(), arrays.time)), total=len(arrays),
+                desc="Processing GPX Points", unit='point(s)'
+        ):
+            area_info = area_infos[index]
             ret_list.append(RoutePoint(
                 index=index,
-                time=point.time,
-                elapsed_time=point.time_difference(first_point),
-                longitude=point.longitude,
-                latitude=point.latitude,
-                longitude_transformed=transformed_coordinate[0],
-                latitude_transformed=transformed_coordinate[1],
-                elevation=point.elevation,
-                distance=total_distance,
-                course=course,
-                speed=speed,
-                province=province_result,
-                city=city_result,
-                area=area_result,
+                time=time,
+                elapsed_time=elapsed_times[index],
+                longitude=longitude,
+                latitude=latitude,
+                longitude_transformed=transformed_longitudes[index],
+                latitude_transformed=transformed_latitudes[index],
+                elevation=elevations[index],
+                distance=total_distances[index],
+                course=courses[index],
+                speed=speeds[index],
+                province=area_info[0] if area_info is not None else None,
+                city=area_info[1] if area_info is not None else None,
+                area=area_info[2] if area_info is not None else None,
             ))
         return Route(
             points=ret_list,
@@ -412,9 +588,10 @@ class Route:
         :param area_code_conn: 存放行政区划代码关系的 SQLite 数据库连接。set_area == True 时必填
         :return: Route
         """
-        with open(gpx_file_path, 'r') as gpx_file:
-            gpx = gpxpy.parse(gpx_file)
-            return Route.from_gpx_obj(gpx, track_index, segment_index, transform_coordinate, coordinate_type, transformed_coordinate_type, set_area, area_gdf_list, area_code_conn)
+        return Route.from_gpx_arrays(
+            read_gpx_segment(gpx_file_path, track_index, segment_index),
+            transform_coordinate, coordinate_type, transformed_coordinate_type, set_area, area_gdf_list, area_code_conn
+        )
 
     @staticmethod
     def from_gpx_file_raw(gpx_file_path: str, track_index: int = 0, segment_index: int = 0) -> 'Route':
@@ -427,6 +604,88 @@ class Route:
         """
         return Route.from_gpx_file(gpx_file_path, track_index, segment_index, False, None, None, False, None, None)
 
+    @staticmethod
+    def from_gpx_segments(
+            source: str | bytes | IO[bytes], transform_coordinate: bool = False,
+            coordinate_type: str = 'wgs84', transformed_coordinate_type: str = 'wgs84', max_workers: Optional[int] = None
+    ) -> list[tuple[int, int, 'Route']]:
+        """
+        解析一次 GPX，把其中每个 track 的每个 segment 各导入为一个行程。各 segment 在进程池中并行计算距离、速度、方向和转换坐标。
+        不填写行政区划：需要时对结果调用 set_area_batch，或像导入接口那样交给 Celery 任务。
+        :param source: GPX 文件路径、文件内容（bytes）或以二进制模式打开的文件
+        :param transform_coordinate: 是否转换坐标
+        :param coordinate_type: 原坐标类型。transform_coordinate == True 时必填
+        :param transformed_coordinate_type: 转换后坐标类型。transform_coordinate == True 时必填
+        :param max_workers: 最大工作进程数，为 None 时使用 CPU 核数，为 1 时不使用进程池
+        :return: [(track 序号, segment 序号, Route)]，按在文件中出现的顺序排列，不含没有轨迹点的 segment
+        """
+        segments = [
+            (track_index, segment_index, arrays) for track_index, segment_index, arrays in iter_gpx_segments(source)
+            if len(arrays) > 0
+        ]
+        routes = process_map_list(
+            partial(
+                Route.from_gpx_arrays, transform_coordinate=transform_coordinate, coordinate_type=coordinate_type,
+                transformed_coordinate_type=transformed_coordinate_type
+            ),
+            [arrays for _, _, arrays in segments], desc="Import GPX Segments", unit='segment(s)', max_workers=max_workers
+        )
+        return [(track_index, segment_index, route) for (track_index, segment_index, _), route in zip(segments, routes)]
+
+    @staticmethod
+    def merge(routes: list['Route']) -> 'Route':
+        """
+        按顺序把多个行程合并为一个，各行程的起点记录在 segment_starts 中。
+        合并后序号连续，用时从第一个有时间的点起算；里程接着上一段累加，但不计两段之间的距离，
+        各段第一个点的速度、方向保持分段计算的结果。传入行程中的点会被直接修改并放入结果。
+        :param routes: 要合并的行程，坐标类型以第一个为准
+        :return: Route
+        """
+        points: list[RoutePoint] = []
+        segment_starts: list[int] = []
+        first_time = next((point.time for route in routes for point in route.points if point.time is not None), None)
+        distance_offset = 0.0
+        for route in routes:
+            if len(route.points) == 0:
+                continue
+            segment_starts.append(len(points))
+            for point in route.points:
+                point.index = len(points)
+                if point.time is not None and first_time is not None:
+                    point.elapsed_time = abs((point.time - first_time).total_seconds())
+                if point.distance is not None:
+                    point.distance = float(point.distance) + distance_offset
+                points.append(point)
+            if points[-1].distance is not None:
+                distance_offset = points[-1].distance
+        return Route(
+            points=points,
+            coordinate_type=routes[0].coordinate_type if routes else None,
+            transformed_coordinate_type=routes[0].transformed_coordinate_type if routes else None,
+            segment_starts=segment_starts,
+        )
+
+    @staticmethod
+    def combine_segments(
+            segment_routes: list[tuple[int, int, 'Route']], mode: str = 'segments'
+    ) -> list[tuple[Optional[int], Optional[int], 'Route']]:
+        """
+        按导入方式组合 from_gpx_segments 的结果
+        :param segment_routes: from_gpx_segments 的结果
+        :param mode: segments：每个 segment 一个行程；tracks：每个 track 一个行程，其中的 segment 按顺序合并；merged：全部合并为一个行程
+        :return: [(track 序号, segment 序号, Route)]，合并后不对应单个 track、segment 的序号为 None
+        """
+        if mode == 'segments':
+            return list(segment_routes)
+        if mode == 'tracks':
+            return [
+                (track_index, None, Route.merge([route for _, _, route in group]))
+                for track_index, group in groupby(segment_routes, key=lambda item: item[0])
+            ]
+        if mode == 'merged':
+            return [(None, None, Route.merge([route for _, _, route in segment_routes]))] if segment_routes else []
+        raise AttributeError(f'Invalid import mode: {mode}')
+
     def to_gpx_obj(self, export_transformed_coordinate: bool = False) -> gpxpy.gpx.GPX:
         """
         导出为 GPX 对象
@@ -480,47 +739,140 @@ class Route:
         转换为 JSON 字符串
         :return: str
         """
-        return json.dumps(self.to_json_dict_obj(), ensure_ascii=False)
+        buf = io.StringIO()
+        self._write_json(buf)
+        return buf.getvalue()
 
-    def to_json_file(self, json_file_path: str):
+    def _write_json(self, f: IO[str]):
+        json_util.dump_stream(f, 'points', (point.to_json_dict_obj() for point in self.points), {
+            'coordinate_type': self.coordinate_type,
+            'transformed_coordinate_type': self.transformed_coordinate_type,
+        })
+
+    def to_json_file(self, json_file: str | IO[str]):
         """
-        转换为 JSON 文件
-        :param json_file_path: JSON 文件路径
+        转换为 JSON 文件。点逐个转换、分批写出，不会在内存中生成完整的字典列表或字符串
+        :param json_file: JSON 文件路径，或以文本模式打开的文件
         :return: None
         """
-        with open(json_file_path, 'w', encoding='utf-8') as f:
-            f.write(self.to_json())
+        if isinstance(json_file, str):
+            with open(json_file, 'w', encoding='utf-8') as f:
+                self._write_json(f)
+        else:
+            self._write_json(json_file)
 
     @staticmethod
-    def from_json(json_str: str) -> 'Route':
+    def from_json(json_str: str | bytes) -> 'Route':
         """
         从 JSON 字符串导入。该导入方式不会自动转换坐标、填写行政区划
         :param json_str:
         :return: Route
         """
+        json_dict_obj = json_util.loads(json_str)
+        return Route(
+            points = [RoutePoint.from_json_dict_obj(point) for point in json_dict_obj['points']],
+            coordinate_type = json_dict_obj['coordinate_type'],
+            transformed_coordinate_type = json_dict_obj['transformed_coordinate_type']
+        )
+
+    @staticmethod
+    def from_json_file(json_file: str | IO[str]) -> 'Route':
+        """
+        从 JSON 文件导入。文件逐点解析，不会把整个文件读入内存
+        :param json_file: JSON 文件路径，或以文本模式打开的文件
+        :return: Route
+        """
+        if isinstance(json_file, str):
+            with open(json_file, 'r', encoding='utf-8') as f:
+                return Route.from_json_file(f)
+        points = []
+        other = {}
+        for key, value in json_util.iter_stream(json_file, 'points'):
+            if key == 'points':
+                points.append(RoutePoint.from_json_dict_obj(value))
+            else:
+                other[key] = value
         return Route(
-            points = [RoutePoint.from_json_dict_obj(point) for point in json.loads(json_str)['points']],
-            coordinate_type = json.loads(json_str)['coordinate_type'],
-            transformed_coordinate_type = json.loads(json_str)['transformed_coordinate_type']
+            points = points,
+            coordinate_type = other['coordinate_type'],
+            transformed_coordinate_type = other['transformed_coordinate_type']
         )
 
+    def to_binary_file(self, binary_file_path: str):
+        """
+        导出为二进制行程文件。数值字段按列定长存放，字符串放在字符串表中，可直接用 numpy.memmap 读取，格式见 route_binary
+        :param binary_file_path: 文件路径
+        :return: None
+        """
+        from .columnar_route import ColumnarRoute
+        ColumnarRoute.from_route(self).to_binary_file(binary_file_path)
+
+    @staticmethod
+    def from_binary_file(binary_file_path: str) -> 'Route':
+        """
+        从二进制行程文件导入。只需要读取部分列或不需要 RoutePoint 对象时，用 ColumnarRoute.from_binary_file 更快
+        :param binary_file_path: 文件路径
+        :return: Route
+        """
+        from .columnar_route import ColumnarRoute
+        return ColumnarRoute.from_binary_file(binary_file_path, mmap=False).to_route()
+
+    def to_arrow_table(self) -> 'pyarrow.Table':
+        """
+        转换为 Arrow 表，列的格式见 ColumnarRoute.to_arrow_table。需要安装 pyarrow
+        :return: pyarrow.Table
+        """
+        from .columnar_route import ColumnarRoute
+        return ColumnarRoute.from_route(self).to_arrow_table()
+
+    @staticmethod
+    def from_arrow_table(table: 'pyarrow.Table') -> 'Route':
+        """
+        从 Arrow 表导入，列的格式见 ColumnarRoute.to_arrow_table
+        :param table: pyarrow.Table
+        :return: Route
+        """
+        from .columnar_route import ColumnarRoute
+        return ColumnarRoute.from_arrow_table(table).to_route()
+
+    def to_parquet(self, parquet_file_path: str, compression: str = 'zstd'):
+        """
+        导出为 Parquet 文件。时间、数值、字符串都按类型存储，可直接用 pandas.read_parquet 读取。需要安装 pyarrow
+        :param parquet_file_path: 文件路径
+        :param compression: 压缩方式，见 pyarrow.parquet.write_table
+        :return: None
+        """
+        from .columnar_route import ColumnarRoute
+        ColumnarRoute.from_route(self).to_parquet(parquet_file_path, compression)
+
     @staticmethod
-    def from_json_file(json_file_path: str) -> 'Route':
+    def from_parquet(parquet_file_path: str) -> 'Route':
         """
-        从 JSON 文件导入
-        :param json_file_path: JSON 文件路径
+        从 Parquet 文件导入。需要安装 pyarrow
+        :param parquet_file_path: 文件路径
         :return: Route
         """
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            return Route.from_json(f.read())
+        from .columnar_route import ColumnarRoute
+        return ColumnarRoute.from_parquet(parquet_file_path).to_route()
 
     def to_csv(self, csv_file_path: str):
         """
-        将点转换为 CSV 格式的文件。
+        将点转换为 CSV 格式的文件。各点逐行写出，不生成字典。
         为确保文件能够直接被 Excel 等表格软件打开，指定编码为带 BOM 的 UTF-8
         """
-        csv_dict_list = [point.to_csv_dict_obj() for point in self.points]
-        csv_util.dict_list_to_csv(csv_dict_list, csv_file_path, encoding='utf-8-sig')
+        csv_util.write_csv_rows(
+            csv_file_path, CSV_FIELDS, (point.to_csv_row() for point in self.points), encoding='utf-8-sig'
+        )
+
+    @staticmethod
+    def iter_csv(csv_file_path: str) -> Iterator[RoutePoint]:
+        """
+        逐行读取 CSV 文件中的点，适合处理无法全部放入内存的文件。
+        :param csv_file_path: CSV 文件路径
+        :return: RoutePoint 的生成器
+        """
+        for row in csv_util.iter_csv_rows(csv_file_path, CSV_PARSERS, encoding='utf-8-sig'):
+            yield RoutePoint.from_csv_row(row)
 
     @staticmethod
     def from_csv(csv_file_path: str, coordinate_type: str = None, transformed_coordinate_type: str = None) -> 'Route':
@@ -531,9 +883,8 @@ class Route:
         :param transformed_coordinate_type: 转换后坐标类型
         :return: Route
         """
-        csv_dict_list = csv_util.csv_to_dict_list(csv_file_path, encoding='utf-8-sig')
         return Route(
-            points = [RoutePoint.from_csv_dict_obj(point) for point in csv_dict_list],
+            points = list(Route.iter_csv(csv_file_path)),
             coordinate_type = coordinate_type,
             transformed_coordinate_type = transformed_coordinate_type
         )
@@ -541,8 +892,11 @@ class Route:
 if __name__ == '__main__':
     test_route = Route.from_gpx_file(
         './test/gpx_sample/from_gps_logger.gpx',
-        transform_coordinate=True, coordinate_type='wgs84', transformed_coordinate_type='gcj02',
-        set_area=True, area_gdf_list=GDFListHandler().list, area_code_conn=AreaCodeConnectHandler().get_connection()
+        transform_coordinate=True, coordinate_type='wgs84', transformed_coordinate_type='gcj02'
+    )
+    # 按需加载模式下 GDFListHandler().list 为 None，按行程范围获取索引
+    test_route.set_area(
+        GDFListHandler().area_index_for_bounds(test_route.bounds()), AreaCodeConnectHandler().get_connection()
     )
     # test_route.to_gpx_file('../../../test/gpx_sample/from_gps_logger_to_gpx.gpx', export_transformed_coordinate=True)
     # test_route_2 = Route.from_gpx_file('../../../test/gpx_sample/from_gps_logger.gpx',
@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from loguru import logger
+
+from .data_type_processor import intern_or_none
+
+
+@dataclass(frozen=True)
+class AreaInfo:
+    """
+    县级行政区划的名称信息
+    """
+    province: str
+    """省"""
+
+    city: str
+    """市"""
+
+    area: str
+    """县/区"""
+
+    province_en: Optional[str] = None
+    """省英文"""
+
+    city_en: Optional[str] = None
+    """市英文"""
+
+    area_en: Optional[str] = None
+    """县/区英文"""
+
+
+class AreaCodeTable:
+    """
+    行政区划代码表。一次性把所有县级行政区划的省、市、县名称读入内存，之后按代码查找不再访问数据库。
+    """
+
+    def __init__(self, rows: Iterable[tuple]):
+        """
+        :param rows: 每行依次为县级行政区划代码、省、市、县名称，之后可选地跟着省、市、县的英文名称
+        """
+        self._area_info_dict: dict[str, AreaInfo] = {
+            row[0]: AreaInfo(*(intern_or_none(name) for name in row[1:])) for row in rows
+        }
+
+    def __len__(self):
+        return len(self._area_info_dict)
+
+    def get(self, area_id: str) -> Optional[AreaInfo]:
+        """
+        根据县级行政区划代码查找名称。
+        :param area_id: 行政区划代码
+        :return: AreaInfo；找不到时返回 None
+        """
+        return self._area_info_dict.get(area_id)
+
+    @staticmethod
+    def from_sqlite(area_code_conn: sqlite3.Connection) -> 'AreaCodeTable':
+        """
+        从存放行政区划代码关系的 SQLite 数据库读取。三张表都有 name_en 列时，一并读取英文名称。
+        :param area_code_conn: 存放行政区划代码关系的 SQLite 数据库连接
+        :return: AreaCodeTable
+        """
+        cursor = area_code_conn.cursor()
+        has_en = all(
+            'name_en' in [column[1] for column in cursor.execute(f'pragma table_info({table})').fetchall()]
+            for table in ('province', 'city', 'area')
+        )
+        en_columns = ', province.name_en, city.name_en, area.name_en' if has_en else ''
+        sql = f"""
+        select area.code, province.name, city.name, area.name{en_columns}
+        from province, city, area
+        where
+            province.code = area.provinceCode
+            and city.code = area.cityCode
+        """
+        cursor.execute(sql)
+        table = AreaCodeTable(cursor.fetchall())
+        cursor.close()
+        logger.info(f"行政区划代码表已加载: {len(table)} 条")
+        return table
+
+
+_area_code_table_lock = threading.Lock()
+_area_code_table: Optional[AreaCodeTable] = None
+
+
+def get_area_code_table(area_code_conn: sqlite3.Connection) -> AreaCodeTable:
+    """
+    获取进程内共享的行政区划代码表，第一次调用时从 SQLite 数据库加载。
+    :param area_code_conn: 存放行政区划代码关系的 SQLite 数据库连接
+    :return: AreaCodeTable
+    """
+    global _area_code_table
+    if _area_code_table is None:
+        with _area_code_table_lock:
+            if _area_code_table is None:
+                _area_code_table = AreaCodeTable.from_sqlite(area_code_conn)
+    return _area_code_table
@@ -0,0 +1,139 @@
+import json
+import math
+import os
+from typing import Optional
+
+import numpy as np
+import shapely
+from loguru import logger
+from tqdm import tqdm
+
+
+class AreaGrid:
+    """
+    行政区划查找网格。
+    把行政区划多边形栅格化到固定大小的网格上，每个单元格记录完全位于其中的多边形在 AreaIndex 中的序号。
+    完全不与任何多边形相交的单元格记为 OUTSIDE，与多边形边界相交的单元格记为 BOUNDARY。
+    查询时，前两种单元格只需一次数组下标即可得出结果，只有 BOUNDARY 单元格中的点才需要再与多边形比较。
+    """
+
+    OUTSIDE = -1
+    """单元格不与任何多边形相交"""
+
+    BOUNDARY = -2
+    """单元格与多边形边界相交，需要再与多边形比较"""
+
+    def __init__(self, cells: np.ndarray, min_x: float, min_y: float, cell_size: float, ids: list[str]):
+        """
+        :param cells: 二维数组，cells[row, col] 对应经度 [min_x + col * cell_size, min_x + (col + 1) * cell_size]、
+            纬度 [min_y + row * cell_size, min_y + (row + 1) * cell_size] 的单元格
+        :param min_x: 网格左下角经度
+        :param min_y: 网格左下角纬度
+        :param cell_size: 单元格边长，单位为度
+        :param ids: 生成网格时 AreaIndex 中各多边形的行政区划代码，用于判断网格与索引是否对应
+        """
+        self.cells = cells
+        self.min_x = min_x
+        self.min_y = min_y
+        self.cell_size = cell_size
+        self.ids = ids
+
+    @staticmethod
+    def build(area_index, cell_size: float) -> 'AreaGrid':
+        """
+        根据 AreaIndex 生成网格。
+        :param area_index: AreaIndex
+        :param cell_size: 单元格边长，单位为度
+        :return: AreaGrid
+        """
+        min_x, min_y, max_x, max_y = shapely.total_bounds(area_index.geometries)
+        cols = max(int(math.ceil((max_x - min_x) / cell_size)), 1)
+        rows = max(int(math.ceil((max_y - min_y) / cell_size)), 1)
+        cells = np.full((rows, cols), AreaGrid.OUTSIDE, dtype=np.int32)
+        for index, polygon in tqdm(enumerate(area_index.geometries), total=len(area_index), desc="Build Area Grid",
+                                   unit='polygon(s)'):
+            shapely.prepare(polygon)
+            p_min_x, p_min_y, p_max_x, p_max_y = polygon.bounds
+            col_start = max(int((p_min_x - min_x) // cell_size), 0)
+            col_end = min(int((p_max_x - min_x) // cell_size) + 1, cols)
+            row_start = max(int((p_min_y - min_y) // cell_size), 0)
+            row_end = min(int((p_max_y - min_y) // cell_size) + 1, rows)
+            col_grid, row_grid = np.meshgrid(np.arange(col_start, col_end), np.arange(row_start, row_end))
+            boxes = shapely.box(
+                min_x + col_grid * cell_size, min_y + row_grid * cell_size,
+                min_x + (col_grid + 1) * cell_size, min_y + (row_grid + 1) * cell_size
+            )
+            interior = shapely.contains_properly(polygon, boxes)
+            boundary = shapely.intersects(polygon, boxes) & ~interior
+            block = cells[row_start:row_end, col_start:col_end]
+            # 单元格已被别的多边形占用时，说明多边形在此重叠，交给精确判断处理
+            conflict = interior & (block != AreaGrid.OUTSIDE) & (block != index)
+            block[interior & (block == AreaGrid.OUTSIDE)] = index
+            block[boundary | conflict] = AreaGrid.BOUNDARY
+        return AreaGrid(cells, float(min_x), float(min_y), cell_size, list(area_index.ids))
+
+    def lookup(self, x, y) -> np.ndarray:
+        """
+        获取各点所在单元格的值。
+        :param x: 经度，标量或数组
+        :param y: 纬度，标量或数组
+        :return: 多边形序号、OUTSIDE 或 BOUNDARY
+        """
+        col = np.floor((np.asarray(x, dtype=np.float64) - self.min_x) / self.cell_size)
+        row = np.floor((np.asarray(y, dtype=np.float64) - self.min_y) / self.cell_size)
+        rows, cols = self.cells.shape
+        in_range = (col >= 0) & (col < cols) & (row >= 0) & (row < rows)
+        col = np.where(in_range, col, 0).astype(np.int64)
+        row = np.where(in_range, row, 0).astype(np.int64)
+        return np.where(in_range, self.cells[row, col], AreaGrid.OUTSIDE)
+
+    def save(self, path: str):
+        """
+        保存到 path（.npy），元数据保存到同名的 .json 文件中。先写临时文件再替换，多个进程同时保存也不会读到不完整的文件。
+        :param path: 网格文件路径
+        :return: None
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, self.cells)
+        os.replace(tmp_path, path)
+        meta_path = os.path.splitext(path)[0] + '.json'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'min_x': self.min_x, 'min_y': self.min_y, 'cell_size': self.cell_size, 'ids': self.ids}, f)
+        os.replace(tmp_path, meta_path)
+
+    @staticmethod
+    def load(path: str) -> Optional['AreaGrid']:
+        """
+        从 path 读取网格。网格数组以内存映射方式打开，多个 worker 进程共享同一份页缓存。
+        :param path: 网格文件路径
+        :return: AreaGrid；文件不存在时返回 None
+        """
+        meta_path = os.path.splitext(path)[0] + '.json'
+        if not os.path.exists(path) or not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        cells = np.load(path, mmap_mode='r')
+        return AreaGrid(cells, meta['min_x'], meta['min_y'], meta['cell_size'], meta['ids'])
+
+    @staticmethod
+    def load_or_build(area_index, cell_size: float, path: Optional[str] = None) -> 'AreaGrid':
+        """
+        读取已保存的网格；不存在或与 area_index 不对应时重新生成，并在给出 path 时保存。
+        :param area_index: AreaIndex
+        :param cell_size: 单元格边长，单位为度
+        :param path: 网格文件路径，为 None 时不读写文件
+        :return: AreaGrid
+        """
+        if path is not None:
+            grid = AreaGrid.load(path)
+            if grid is not None and grid.cell_size == cell_size and grid.ids == list(area_index.ids):
+                logger.info(f"已加载行政区划查找网格: {path}")
+                return grid
+        grid = AreaGrid.build(area_index, cell_size)
+        if path is not None:
+            grid.save(path)
+            logger.info(f"已保存行政区划查找网格: {path}")
+        return grid
@@ -0,0 +1,300 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import shapely
+from geopandas import GeoDataFrame
+from shapely import Point, STRtree
+
+from .area_grid import AreaGrid
+from .area_lookup_cache import AreaLookupCache
+
+
+class AreaIndex:
+    """
+    行政区划多边形的空间索引。
+    把各地区 GeoDataFrame 中的多边形及其 id 汇总到一棵 STRtree 里：查询时先用外包矩形筛出少量候选多边形，再对候选做精确判断，
+    而不必对每个多边形逐一调用 contains。
+
+    精确判断时，每个多边形还带有两个简化后的轮廓：内轮廓完全位于多边形内部，落在其中的点一定在多边形内；
+    外轮廓完全包住多边形，落在其外的点一定不在多边形内。只有落在两者之间、靠近边界的点，才需要与完整精度的多边形（prepared geometry）比较。
+    简化轮廓在多边形第一次被用到时才生成。
+    """
+
+    def __init__(self, area_gdf_list: list[GeoDataFrame], simplify_tolerance: float = 0.001):
+        """
+        :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表
+        :param simplify_tolerance: 简化轮廓与原多边形边界的距离，单位为度
+        """
+        geometries = []
+        ids = []
+        for gdf in area_gdf_list:
+            geometries.extend(gdf.geometry.values)
+            ids.extend(gdf['id'].tolist())
+        self.geometries = np.array(geometries, dtype=object)
+        """多边形，顺序与 area_gdf_list 中的顺序一致"""
+        self.ids = ids
+        """多边形对应的行政区划代码"""
+        self.tree = STRtree(self.geometries)
+        self.simplify_tolerance = simplify_tolerance
+        self._inner = [None] * len(self.ids)
+        self._outer = [None] * len(self.ids)
+        self._ring_built = np.zeros(len(self.ids), dtype=bool)
+        self._ring_lock = threading.Lock()
+        """轮廓按需生成，且 shapely.prepare 会修改共享的几何对象，多线程查询时需要加锁"""
+        self.grid: Optional[AreaGrid] = None
+        """行政区划查找网格，见 attach_grid"""
+        self.cache: Optional[AreaLookupCache] = None
+        """按量化坐标缓存的查询结果，见 attach_cache"""
+        self._id_to_index: dict[str, int] = {}
+        for index, area_id in enumerate(self.ids):
+            self._id_to_index.setdefault(area_id, index)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def attach_grid(self, grid: AreaGrid):
+        """
+        挂载行政区划查找网格。挂载后，查询先看点所在的单元格，只有落在边界单元格中的点才与多边形比较。
+        :param grid: 由本索引生成的 AreaGrid
+        :return: None
+        """
+        if grid.ids != list(self.ids):
+            raise ValueError("AreaGrid does not match this AreaIndex")
+        self.grid = grid
+
+    def attach_cache(self, cache: AreaLookupCache):
+        """
+        挂载按量化坐标缓存的查询结果。挂载后，单点查询（query_index）先查缓存；未命中时正常查询，
+        若点所在的整个单元格都位于同一个多边形内部，则把结果写入缓存。批量查询不经过缓存。
+        :param cache: AreaLookupCache
+        :return: None
+        """
+        self.cache = cache
+
+    def _build_rings(self, index: int):
+        """
+        生成第 index 个多边形的内、外简化轮廓，并准备（prepare）原多边形。
+        缓冲后再简化，并用原多边形校验；校验不通过的轮廓弃用，对应的点总是走精确判断，保证结果不变。
+        可以在多个线程中调用，每个多边形只生成一次。
+        """
+        with self._ring_lock:
+            if not self._ring_built[index]:
+                self._build_rings_locked(index)
+
+    def _build_rings_locked(self, index: int):
+        polygon = self.geometries[index]
+        shapely.prepare(polygon)
+        tolerance = self.simplify_tolerance
+        inner = polygon.buffer(-tolerance).simplify(tolerance / 2)
+        if inner.is_empty or not polygon.contains(inner):
+            inner = None
+        else:
+            shapely.prepare(inner)
+        outer = polygon.buffer(tolerance).simplify(tolerance / 2)
+        if not outer.contains(polygon):
+            outer = None
+        else:
+            shapely.prepare(outer)
+        self._inner[index] = inner
+        self._outer[index] = outer
+        self._ring_built[index] = True
+
+    def contains_xy(self, index: int, x, y) -> np.ndarray | bool:
+        """
+        判断各点是否在第 index 个多边形内，与 polygon.contains(point) 的结果一致。
+        :param index: 多边形序号
+        :param x: 经度，标量或数组
+        :param y: 纬度，标量或数组
+        :return: bool 数组；输入为标量时返回 bool
+        """
+        if not self._ring_built[index]:
+            self._build_rings(index)
+        inner = self._inner[index]
+        outer = self._outer[index]
+        if np.ndim(x) == 0:
+            if inner is not None and shapely.contains_xy(inner, x, y):
+                return True
+            if outer is not None and not shapely.contains_xy(outer, x, y):
+                return False
+            return bool(shapely.contains_xy(self.geometries[index], x, y))
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        result = np.zeros(x.shape, dtype=bool)
+        undecided = np.ones(x.shape, dtype=bool)
+        if inner is not None:
+            result |= shapely.contains_xy(inner, x, y)
+            undecided &= ~result
+        if outer is not None:
+            undecided &= shapely.contains_xy(outer, x, y)
+        if undecided.any():
+            result[undecided] = shapely.contains_xy(self.geometries[index], x[undecided], y[undecided])
+        return result
+
+    def query_index(self, point: Point) -> Optional[int]:
+        """
+        获取包含给定点的多边形在索引中的序号。
+        多边形互相重叠时，与原先逐个遍历的做法一致，返回顺序最靠前的一个。
+        :param point: 点
+        :return: 多边形序号；不在任何多边形内时返回 None
+        """
+        if self.grid is not None:
+            cell = int(self.grid.lookup(point.x, point.y))
+            if cell >= 0:
+                return cell
+            if cell == AreaGrid.OUTSIDE:
+                return None
+        if self.cache is None:
+            return self._query_index_exact(point)
+        cell = self.cache.cell_of(point.x, point.y)
+        area_id = self.cache.get(cell)
+        if area_id is not None and area_id in self._id_to_index:
+            return self._id_to_index[area_id]
+        index = self._query_index_exact(point)
+        if index is not None and self._contains_cell(index, self.cache.cell_bounds(cell)):
+            self.cache.put(cell, self.ids[index])
+        return index
+
+    def _query_index_exact(self, point: Point) -> Optional[int]:
+        """query_index 中不经过网格和缓存、直接查询 STRtree 的部分"""
+        for candidate in np.sort(self.tree.query(point)):
+            if self.contains_xy(candidate, point.x, point.y):
+                return int(candidate)
+        return None
+
+    def _contains_cell(self, index: int, bounds: tuple[float, float, float, float]) -> bool:
+        """判断整个单元格是否都位于第 index 个多边形内部，且不与其他多边形相交"""
+        if not self._ring_built[index]:
+            self._build_rings(index)
+        cell = shapely.box(*bounds)
+        if not shapely.contains_properly(self.geometries[index], cell):
+            return False
+        return all(candidate == index for candidate in self.tree.query(cell, predicate='intersects'))
+
+    def query(self, point: Point) -> Optional[str]:
+        """
+        获取给定点所在地区的行政区划代码。
+        :param point: 点
+        :return: 行政区划代码；不在任何多边形内时返回 None
+        """
+        index = self.query_index(point)
+        return self.ids[index] if index is not None else None
+
+    def query_index_many(self, longitudes, latitudes) -> np.ndarray:
+        """
+        批量获取包含各点的多边形序号。所有点组成一个数组，一次性在 STRtree 中完成查询。
+        :param longitudes: 经度序列
+        :param latitudes: 纬度序列
+        :return: 与输入等长的 int64 数组，不在任何多边形内的点为 -1
+        """
+        x = np.asarray(longitudes, dtype=np.float64)
+        y = np.asarray(latitudes, dtype=np.float64)
+        if self.grid is not None:
+            result = self.grid.lookup(x, y).astype(np.int64)
+            boundary = np.flatnonzero(result == AreaGrid.BOUNDARY)
+            result[result == AreaGrid.OUTSIDE] = -1
+            if len(boundary) > 0:
+                result[boundary] = self._query_index_many_exact(x[boundary], y[boundary])
+            return result
+        return self._query_index_many_exact(x, y)
+
+    def _query_index_many_exact(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """query_index_many 中不经过网格、直接查询 STRtree 的部分"""
+        point_index, polygon_index = self.tree.query(shapely.points(x, y))
+        # 按多边形分组做精确判断，每个多边形只需一次矢量化的判断
+        hit = np.zeros(len(point_index), dtype=bool)
+        order = np.argsort(polygon_index, kind='stable')
+        polygons, starts = np.unique(polygon_index[order], return_index=True)
+        for polygon, group in zip(polygons, np.split(order, starts[1:])):
+            hit[group] = self.contains_xy(polygon, x[point_index[group]], y[point_index[group]])
+        # 多边形互相重叠时取序号最小的一个，与 query_index 保持一致
+        result = np.full(len(x), len(self), dtype=np.int64)
+        np.minimum.at(result, point_index[hit], polygon_index[hit])
+        result[result == len(self)] = -1
+        return result
+
+    def query_many(self, longitudes, latitudes) -> list[Optional[str]]:
+        """
+        批量获取各点所在地区的行政区划代码。
+        :param longitudes: 经度序列
+        :param latitudes: 纬度序列
+        :return: 与输入等长的列表，不在任何多边形内的点为 None
+        """
+        return [self.ids[index] if index >= 0 else None for index in self.query_index_many(longitudes, latitudes)]
+
+    def query_index_run(self, longitudes, latitudes, max_stride: int = 32) -> np.ndarray:
+        """
+        按轨迹顺序获取包含各点的多边形序号。
+        相邻的点几乎总在同一个地区内，因此先用上一个点所在的多边形判断后面的点：每次把之后的一段点一起交给 contains_xy 判断，
+        段长逐次加倍（不超过 max_stride）；段中有不在该多边形内的点时，第一个这样的点就是越界处，再对它做完整的索引查询。
+        每个点都经过判断，不会漏掉在段内离开某地区后又回来的情况。
+        多边形互不重叠时结果与 query_index_many 相同；多边形重叠时，重叠区域内的点沿用上一个点所在的多边形，
+        而 query_index_many 取序号最小的一个。
+        :param longitudes: 经度序列，按轨迹顺序排列
+        :param latitudes: 纬度序列，按轨迹顺序排列
+        :param max_stride: 一次判断的最大点数，只影响速度
+        :return: 与输入等长的 int64 数组，不在任何多边形内的点为 -1
+        """
+        x = np.asarray(longitudes, dtype=np.float64)
+        y = np.asarray(latitudes, dtype=np.float64)
+        n = len(x)
+        result = np.full(n, -1, dtype=np.int64)
+        i = 0
+        while i < n:
+            current = self.query_index(Point(x[i], y[i]))
+            if current is None:
+                i += 1
+                continue
+            inside = i
+            stride = 1
+            while inside < n - 1:
+                end = min(inside + stride, n - 1)
+                hit = self.contains_xy(current, x[inside + 1:end + 1], y[inside + 1:end + 1])
+                if hit.all():
+                    inside = end
+                    stride = min(stride * 2, max_stride)
+                    continue
+                # 段中第一个不在多边形内的点之前的点都在多边形内
+                inside += int(np.argmin(hit))
+                break
+            result[i:inside + 1] = current
+            i = inside + 1
+        return result
+
+    def query_run(self, longitudes, latitudes, max_stride: int = 32) -> list[Optional[str]]:
+        """
+        按轨迹顺序获取各点所在地区的行政区划代码。说明见 query_index_run。
+        :param longitudes: 经度序列，按轨迹顺序排列
+        :param latitudes: 纬度序列，按轨迹顺序排列
+        :param max_stride: 一次判断的最大点数
+        :return: 与输入等长的列表，不在任何多边形内的点为 None
+        """
+        return [self.ids[index] if index >= 0 else None for index in self.query_index_run(longitudes, latitudes, max_stride)]
+
+
+_area_index_lock = threading.Lock()
+_AREA_INDEX_CACHE_SIZE = 8
+"""get_area_index 最多缓存的索引数。list 不能被弱引用，所以按最近使用顺序淘汰，避免传入过的列表及其索引一直不被回收"""
+
+_area_index_cache: OrderedDict[int, tuple[list[GeoDataFrame], AreaIndex]] = OrderedDict()
+
+
+def get_area_index(area: list[GeoDataFrame] | AreaIndex) -> AreaIndex:
+    """
+    获取与给定 GeoDataFrame 列表对应的 AreaIndex。最近用过的 _AREA_INDEX_CACHE_SIZE 个列表不会重复构建索引。
+    :param area: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表，或已经构建好的 AreaIndex
+    :return: AreaIndex
+    """
+    if isinstance(area, AreaIndex):
+        return area
+    with _area_index_lock:
+        cached = _area_index_cache.get(id(area))
+        if cached is None or cached[0] is not area:
+            # 保留列表本身的引用，避免列表被回收后 id 被复用
+            cached = (area, AreaIndex(area))
+            _area_index_cache[id(area)] = cached
+            while len(_area_index_cache) > _AREA_INDEX_CACHE_SIZE:
+                _area_index_cache.popitem(last=False)
+        _area_index_cache.move_to_end(id(area))
+    return cached[1]
@@ -0,0 +1,133 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from loguru import logger
+
+
+class AreaLookupCache:
+    """
+    按量化坐标缓存的行政区划查询结果。
+    经纬度按 cell_size 划分为单元格，只有整个单元格都位于同一个多边形内部时才会被缓存，因此命中的结果与实际查询的结果一致。
+    缓存分两层：进程内的 LRU，以及可选的 Redis（多个进程、多台机器共享）。
+    """
+
+    def __init__(
+            self, cell_size: float = 0.001, max_size: int = 100000,
+            redis_client=None, namespace: str = '', redis_ttl: Optional[int] = None
+    ):
+        """
+        :param cell_size: 单元格边长，单位为度
+        :param max_size: 进程内 LRU 最多保存的单元格数
+        :param redis_client: Redis 客户端，如 ext.redis_client。为 None 时只使用进程内缓存
+        :param namespace: Redis 键的命名空间，行政区划数据变化时应随之变化，如 GeoJSON 文件的指纹
+        :param redis_ttl: Redis 中缓存的过期时间（秒），为 None 时不过期
+        """
+        self.cell_size = cell_size
+        self.max_size = max_size
+        self.redis_client = redis_client
+        self.namespace = namespace
+        self.redis_ttl = redis_ttl
+        self._lock = threading.Lock()
+        self._cells: OrderedDict[tuple[int, int], str] = OrderedDict()
+        self.local_hits = 0
+        """进程内缓存命中次数"""
+        self.redis_hits = 0
+        """Redis 缓存命中次数"""
+        self.misses = 0
+        """未命中次数"""
+
+    def set_redis_client(self, redis_client):
+        """
+        设置 Redis 客户端，启用 Redis 缓存。
+        :param redis_client: Redis 客户端，如 ext.redis_client
+        :return: None
+        """
+        self.redis_client = redis_client
+
+    def cell_of(self, x: float, y: float) -> tuple[int, int]:
+        """
+        获取点所在的单元格。
+        :param x: 经度
+        :param y: 纬度
+        :return: (列, 行)
+        """
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def cell_bounds(self, cell: tuple[int, int]) -> tuple[float, float, float, float]:
+        """
+        获取单元格的范围。
+        :param cell: (列, 行)
+        :return: (min_x, min_y, max_x, max_y)
+        """
+        col, row = cell
+        return (
+            col * self.cell_size, row * self.cell_size,
+            (col + 1) * self.cell_size, (row + 1) * self.cell_size
+        )
+
+    def _redis_key(self, cell: tuple[int, int]) -> str:
+        return f'gpxutil:area_cell:{self.namespace}:{self.cell_size}:{cell[0]}:{cell[1]}'
+
+    def get(self, cell: tuple[int, int]) -> Optional[str]:
+        """
+        查询单元格所在地区的行政区划代码。
+        :param cell: (列, 行)
+        :return: 行政区划代码；未缓存时返回 None
+        """
+        with self._lock:
+            area_id = self._cells.get(cell)
+            if area_id is not None:
+                self._cells.move_to_end(cell)
+                self.local_hits += 1
+                return area_id
+        if self.redis_client is not None:
+            try:
+                value = self.redis_client.get(self._redis_key(cell))
+            except Exception as e:
+                logger.warning(f"读取行政区划 Redis 缓存失败: {e}")
+                value = None
+            if value is not None:
+                area_id = value.decode('utf-8') if isinstance(value, bytes) else value
+                self._put_local(cell, area_id)
+                with self._lock:
+                    self.redis_hits += 1
+                return area_id
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, cell: tuple[int, int], area_id: str):
+        """
+        缓存单元格所在地区。调用方需确保整个单元格都位于该地区内部。
+        :param cell: (列, 行)
+        :param area_id: 行政区划代码
+        :return: None
+        """
+        self._put_local(cell, area_id)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.set(self._redis_key(cell), area_id, ex=self.redis_ttl)
+            except Exception as e:
+                logger.warning(f"写入行政区划 Redis 缓存失败: {e}")
+
+    def _put_local(self, cell: tuple[int, int], area_id: str):
+        with self._lock:
+            self._cells[cell] = area_id
+            self._cells.move_to_end(cell)
+            while len(self._cells) > self.max_size:
+                self._cells.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        """
+        缓存的命中统计。
+        :return: dict[str, int]
+        """
+        with self._lock:
+            return {
+                'local_hits': self.local_hits,
+                'redis_hits': self.redis_hits,
+                'misses': self.misses,
+                'size': len(self._cells),
+            }
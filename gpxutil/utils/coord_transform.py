@@ -0,0 +1,221 @@
+"""
+WGS84、GCJ02（火星坐标系）、BD09（百度坐标系）之间的坐标转换。
+算法与 vendor/coordTransform_py/coordTransform_utils 相同，但输入、输出都是 numpy 数组，一次处理整条轨迹的所有点。
+"""
+import numpy as np
+
+x_pi = 3.14159265358979324 * 3000.0 / 180.0
+pi = 3.1415926535897932384626  # π
+a = 6378245.0  # 长半轴
+ee = 0.00669342162296594323  # 偏心率平方
+
+
+def _as_array(lng, lat) -> tuple[np.ndarray, np.ndarray]:
+    return np.asarray(lng, dtype=np.float64), np.asarray(lat, dtype=np.float64)
+
+
+def out_of_china(lng, lat) -> np.ndarray:
+    """
+    判断各点是否在国内，不在国内不做偏移
+    :param lng: 经度数组
+    :param lat: 纬度数组
+    :return: bool 数组，不在国内的点为 True
+    """
+    lng, lat = _as_array(lng, lat)
+    return ~((lng > 73.66) & (lng < 135.05) & (lat > 3.86) & (lat < 53.55))
+
+
+def _transformlat(lng: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    ret = -100.0 + 2.0 * lng + 3.0 * lat + 0.2 * lat * lat + \
+          0.1 * lng * lat + 0.2 * np.sqrt(np.fabs(lng))
+    ret += (20.0 * np.sin(6.0 * lng * pi) + 20.0 *
+            np.sin(2.0 * lng * pi)) * 2.0 / 3.0
+    ret += (20.0 * np.sin(lat * pi) + 40.0 *
+            np.sin(lat / 3.0 * pi)) * 2.0 / 3.0
+    ret += (160.0 * np.sin(lat / 12.0 * pi) + 320 *
+            np.sin(lat * pi / 30.0)) * 2.0 / 3.0
+    return ret
+
+
+def _transformlng(lng: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    ret = 300.0 + lng + 2.0 * lat + 0.1 * lng * lng + \
+          0.1 * lng * lat + 0.1 * np.sqrt(np.fabs(lng))
+    ret += (20.0 * np.sin(6.0 * lng * pi) + 20.0 *
+            np.sin(2.0 * lng * pi)) * 2.0 / 3.0
+    ret += (20.0 * np.sin(lng * pi) + 40.0 *
+            np.sin(lng / 3.0 * pi)) * 2.0 / 3.0
+    ret += (150.0 * np.sin(lng / 12.0 * pi) + 300.0 *
+            np.sin(lng / 30.0 * pi)) * 2.0 / 3.0
+    return ret
+
+
+def _gcj02_offset(lng: np.ndarray, lat: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    计算 WGS84 到 GCJ02 的偏移量，不在国内的点偏移量为 0
+    :return: (经度偏移, 纬度偏移)
+    """
+    dlat = _transformlat(lng - 105.0, lat - 35.0)
+    dlng = _transformlng(lng - 105.0, lat - 35.0)
+    radlat = lat / 180.0 * pi
+    magic = np.sin(radlat)
+    magic = 1 - ee * magic * magic
+    sqrtmagic = np.sqrt(magic)
+    dlat = (dlat * 180.0) / ((a * (1 - ee)) / (magic * sqrtmagic) * pi)
+    dlng = (dlng * 180.0) / (a / sqrtmagic * np.cos(radlat) * pi)
+    outside = out_of_china(lng, lat)
+    return np.where(outside, 0.0, dlng), np.where(outside, 0.0, dlat)
+
+
+def gcj02_to_bd09(lng, lat) -> tuple[np.ndarray, np.ndarray]:
+    """
+    火星坐标系(GCJ-02)转百度坐标系(BD-09)
+    :param lng: 火星坐标经度数组
+    :param lat: 火星坐标纬度数组
+    :return: (经度数组, 纬度数组)
+    """
+    lng, lat = _as_array(lng, lat)
+    z = np.sqrt(lng * lng + lat * lat) + 0.00002 * np.sin(lat * x_pi)
+    theta = np.arctan2(lat, lng) + 0.000003 * np.cos(lng * x_pi)
+    return z * np.cos(theta) + 0.0065, z * np.sin(theta) + 0.006
+
+
+def bd09_to_gcj02(bd_lon, bd_lat) -> tuple[np.ndarray, np.ndarray]:
+    """
+    百度坐标系(BD-09)转火星坐标系(GCJ-02)
+    :param bd_lon: 百度坐标经度数组
+    :param bd_lat: 百度坐标纬度数组
+    :return: (经度数组, 纬度数组)
+    """
+    bd_lon, bd_lat = _as_array(bd_lon, bd_lat)
+    x = bd_lon - 0.0065
+    y = bd_lat - 0.006
+    z = np.sqrt(x * x + y * y) - 0.00002 * np.sin(y * x_pi)
+    theta = np.arctan2(y, x) - 0.000003 * np.cos(x * x_pi)
+    return z * np.cos(theta), z * np.sin(theta)
+
+
+def wgs84_to_gcj02(lng, lat) -> tuple[np.ndarray, np.ndarray]:
+    """
+    WGS84 转 GCJ02(火星坐标系)
+    :param lng: WGS84 坐标系的经度数组
+    :param lat: WGS84 坐标系的纬度数组
+    :return: (经度数组, 纬度数组)
+    """
+    lng, lat = _as_array(lng, lat)
+    dlng, dlat = _gcj02_offset(lng, lat)
+    return lng + dlng, lat + dlat
+
+
+def gcj02_to_wgs84(lng, lat) -> tuple[np.ndarray, np.ndarray]:
+    """
+    GCJ02(火星坐标系) 转 WGS84
+    :param lng: 火星坐标系的经度数组
+    :param lat: 火星坐标系的纬度数组
+    :return: (经度数组, 纬度数组)
+    """
+    lng, lat = _as_array(lng, lat)
+    dlng, dlat = _gcj02_offset(lng, lat)
+    return lng - dlng, lat - dlat
+
+
+def bd09_to_wgs84(bd_lon, bd_lat) -> tuple[np.ndarray, np.ndarray]:
+    """
+    百度坐标系(BD-09) 转 WGS84
+    :param bd_lon: 百度坐标经度数组
+    :param bd_lat: 百度坐标纬度数组
+    :return: (经度数组, 纬度数组)
+    """
+    return gcj02_to_wgs84(*bd09_to_gcj02(bd_lon, bd_lat))
+
+
+def wgs84_to_bd09(lng, lat) -> tuple[np.ndarray, np.ndarray]:
+    """
+    WGS84 转百度坐标系(BD-09)
+    :param lng: WGS84 坐标系的经度数组
+    :param lat: WGS84 坐标系的纬度数组
+    :return: (经度数组, 纬度数组)
+    """
+    return gcj02_to_bd09(*wgs84_to_gcj02(lng, lat))
+
+
+DEFAULT_TOLERANCE = 1e-9
+"""精确逆转换的默认收敛阈值，单位为度（约 0.1 毫米）"""
+
+DEFAULT_MAX_ITERATIONS = 20
+"""精确逆转换的默认最大迭代次数"""
+
+
+def _iterative_inverse(
+        forward, x, y, init_x: np.ndarray, init_y: np.ndarray,
+        tolerance: float, max_iterations: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    用不动点迭代求 forward 的逆：每轮把 forward(当前结果) 与目标坐标的差加回当前结果，直到差小于 tolerance。
+    所有点一起迭代，已收敛的点不再参与计算。
+    :param forward: 正向转换函数，如 wgs84_to_gcj02
+    :param x: 目标经度数组
+    :param y: 目标纬度数组
+    :param init_x: 初始经度数组，一般为近似逆转换的结果
+    :param init_y: 初始纬度数组
+    :param tolerance: 收敛阈值，单位为度
+    :param max_iterations: 最大迭代次数
+    :return: (经度数组, 纬度数组)
+    """
+    x, y = _as_array(x, y)
+    shape = x.shape
+    x, y = x.ravel(), y.ravel()
+    cur_x = np.array(init_x, dtype=np.float64).ravel()
+    cur_y = np.array(init_y, dtype=np.float64).ravel()
+    active = np.arange(x.size)
+    for _ in range(max_iterations):
+        if active.size == 0:
+            break
+        forward_x, forward_y = forward(cur_x[active], cur_y[active])
+        dx = x[active] - forward_x
+        dy = y[active] - forward_y
+        cur_x[active] += dx
+        cur_y[active] += dy
+        active = active[(np.fabs(dx) > tolerance) | (np.fabs(dy) > tolerance)]
+    return cur_x.reshape(shape), cur_y.reshape(shape)
+
+
+def gcj02_to_wgs84_precise(
+        lng, lat, tolerance: float = DEFAULT_TOLERANCE, max_iterations: int = DEFAULT_MAX_ITERATIONS
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    GCJ02(火星坐标系) 精确转 WGS84。gcj02_to_wgs84 只做一步近似，误差可达数米；这里以其结果为初值迭代到 tolerance。
+    :param lng: 火星坐标系的经度数组
+    :param lat: 火星坐标系的纬度数组
+    :param tolerance: 收敛阈值，单位为度
+    :param max_iterations: 最大迭代次数
+    :return: (经度数组, 纬度数组)
+    """
+    return _iterative_inverse(wgs84_to_gcj02, lng, lat, *gcj02_to_wgs84(lng, lat), tolerance, max_iterations)
+
+
+def bd09_to_gcj02_precise(
+        bd_lon, bd_lat, tolerance: float = DEFAULT_TOLERANCE, max_iterations: int = DEFAULT_MAX_ITERATIONS
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    百度坐标系(BD-09) 精确转 GCJ02，以 bd09_to_gcj02 的结果为初值迭代到 tolerance。
+    :param bd_lon: 百度坐标经度数组
+    :param bd_lat: 百度坐标纬度数组
+    :param tolerance: 收敛阈值，单位为度
+    :param max_iterations: 最大迭代次数
+    :return: (经度数组, 纬度数组)
+    """
+    return _iterative_inverse(gcj02_to_bd09, bd_lon, bd_lat, *bd09_to_gcj02(bd_lon, bd_lat), tolerance, max_iterations)
+
+
+def bd09_to_wgs84_precise(
+        bd_lon, bd_lat, tolerance: float = DEFAULT_TOLERANCE, max_iterations: int = DEFAULT_MAX_ITERATIONS
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    百度坐标系(BD-09) 精确转 WGS84，以 bd09_to_wgs84 的结果为初值迭代到 tolerance。
+    :param bd_lon: 百度坐标经度数组
+    :param bd_lat: 百度坐标纬度数组
+    :param tolerance: 收敛阈值，单位为度
+    :param max_iterations: 最大迭代次数
+    :return: (经度数组, 纬度数组)
+    """
+    return _iterative_inverse(wgs84_to_bd09, bd_lon, bd_lat, *bd09_to_wgs84(bd_lon, bd_lat), tolerance, max_iterations)
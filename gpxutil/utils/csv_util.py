@@ -1,5 +1,5 @@
 import csv
-from typing import Optional
+from typing import Optional, Callable, Iterable, Iterator, Sequence, Any
 
 from .data_type_processor import none_if_empty
 
@@ -69,9 +69,55 @@ def dict_list_to_csv(dict_list: list[dict], file_path: str, **kwargs):
     with open(file_path, 'w', newline='', **kwargs) as csv_file:
         writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
         writer.writeheader()
-        for row_dict in dict_list:
-            write_row = row_dict.copy()
-            writer.writerow(write_row)
+        writer.writerows(dict_list)
+
+
+def iter_csv_rows(
+        file_path: str,
+        parsers: dict[str, Optional[Callable[[str], Any]]],
+        **kwargs
+) -> Iterator[tuple]:
+    """
+    逐行读取 CSV 文件，按给定的列解析后以元组返回。不为每行生成字典，适合读取很大的文件
+
+    :param file_path: CSV 文件路径
+    :param parsers: 列名到解析函数的映射，返回的元组按其顺序排列。解析函数只作用于非空字符串，为 None 时保留原字符串；
+                    空字符串和文件中没有的列为 None
+    :param kwargs: 传递给 `open` 的其他参数（如编码方式）
+    :return: 每行解析后的元组
+    """
+    with open(file_path, 'r', newline='', **kwargs) as csv_file:
+        csv_reader = csv.reader(csv_file)
+        header = next(csv_reader, None)
+        if header is None:
+            return
+        positions = {name: position for position, name in enumerate(header)}
+        columns = [(positions.get(name), parser) for name, parser in parsers.items()]
+        width = len(header)
+        for row in csv_reader:
+            if len(row) < width:
+                row = row + [''] * (width - len(row))
+            yield tuple(
+                None if position is None or not row[position]
+                else row[position] if parser is None
+                else parser(row[position])
+                for position, parser in columns
+            )
+
+
+def write_csv_rows(file_path: str, fieldnames: Sequence[str], rows: Iterable[Sequence], **kwargs):
+    """
+    把按列顺序排列的行写入 CSV 文件，None 写为空字符串。rows 可以是生成器，逐行写出
+
+    :param file_path: CSV 文件路径
+    :param fieldnames: 表头
+    :param rows: 各行的值，顺序与 fieldnames 相同
+    :param kwargs: 传递给 open() 的其他参数（如编码方式）
+    """
+    with open(file_path, 'w', newline='', **kwargs) as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(fieldnames)
+        writer.writerows(rows)
 
 if __name__ == '__main__':
     a = csv_to_dict_list("../../../test/to_csv.csv")
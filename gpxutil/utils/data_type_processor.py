@@ -1,3 +1,4 @@
+import sys
 from functools import partial
 
 def none_if_empty(item: str):
@@ -21,5 +22,8 @@ def process_or_none(data, processor: callable):
 
 float_or_none = partial(process_or_none, processor=float)
 
+intern_or_none = partial(process_or_none, processor=sys.intern)
+"""驻留字符串，相同内容只保留一份。用于行政区划、道路名称等在大量点中重复出现的字符串"""
+
 if __name__ == '__main__':
     print(float_or_none('3'))
@@ -1,15 +1,23 @@
 import datetime
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def _parse_yyyymmdd_slash(date_str: str) -> datetime.date:
+    """解析 YYYY/mm/dd 格式的日期。同一条行程中的点大多在同一天，缓存后每个日期只解析一次"""
+    return datetime.datetime.strptime(date_str, '%Y/%m/%d').date()
 
 
 def datetime_yyyymmdd_slash_time_microsecond_tz(date_str: str, time_str: str, microsecond: int = 0, timezone: datetime.timezone = datetime.timezone.utc) -> datetime.datetime:
     """
     根据日期（YYYY/mm/dd）、时间（'HH:MM:SS'）、毫秒、时区，给出 datetime 对象。
     """
-    date = datetime.datetime.strptime(date_str + ' ' + time_str, '%Y/%m/%d %H:%M:%S')
+    date = _parse_yyyymmdd_slash(date_str)
+    hour, minute, second = time_str.split(':')
     # date 添加 microsecond 和时区
-    date = date + datetime.timedelta(microseconds=microsecond)
-    date = date.replace(tzinfo=timezone)
-    return date
+    return datetime.datetime(
+        date.year, date.month, date.day, int(hour), int(minute), int(second), tzinfo=timezone
+    ) + datetime.timedelta(microseconds=microsecond)
 
 def datetime_yyyymmdd_slash_time_to_iso(date_str: str, time_str: str, microsecond: int = 0, timezone: datetime.timezone = datetime.timezone.utc) -> str:
     """
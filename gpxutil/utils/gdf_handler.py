@@ -1,26 +1,143 @@
+import hashlib
+import json
 import os
 import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import shapely
 
 import geopandas as gpd
 from geopandas import GeoDataFrame
+from loguru import logger
 
 from ..core.config import CONFIG_HANDLER
+from ..utils.area_grid import AreaGrid
+from ..utils.area_index import AreaIndex, get_area_index
+from ..utils.area_lookup_cache import AreaLookupCache
 from ..utils.process import threaded_map_list
 
 GEOJSON_DIR = CONFIG_HANDLER.config.area_info.gdf_dir_path
+CACHE_DIR = CONFIG_HANDLER.config.area_info.cache_dir_path
+GRID_CELL_SIZE = CONFIG_HANDLER.config.area_info.grid_cell_size
+LAZY_LOAD = CONFIG_HANDLER.config.area_info.lazy_load
+LAZY_LOAD_MEMORY_LIMIT_MB = CONFIG_HANDLER.config.area_info.lazy_load_memory_limit_mb
+LAZY_LOAD_INDEX_CACHE_SIZE = CONFIG_HANDLER.config.area_info.lazy_load_index_cache_size
+LOOKUP_CACHE_CELL_SIZE = CONFIG_HANDLER.config.area_info.lookup_cache_cell_size
+LOOKUP_CACHE_MAX_SIZE = CONFIG_HANDLER.config.area_info.lookup_cache_max_size
+
+
+def is_area_geojson_file(filename: str) -> bool:
+    return filename.endswith(".json") or filename.endswith(".geojson")
+
+
+def area_geojson_fingerprint(geojson_dir: str) -> str:
+    """
+    根据目录中各 GeoJSON 文件的文件名、大小和修改时间生成指纹。文件有任何变化，指纹即随之变化，用作缓存的键。
+    :param geojson_dir: 存放各地区 geojson 文件的目录
+    :return: 十六进制字符串
+    """
+    sha1 = hashlib.sha1()
+    for filename in sorted(os.listdir(geojson_dir)):
+        if is_area_geojson_file(filename):
+            stat = os.stat(os.path.join(geojson_dir, filename))
+            sha1.update(f'{filename}:{stat.st_size}:{stat.st_mtime_ns};'.encode('utf-8'))
+    return sha1.hexdigest()
 
-def load_area_gdf_list(geojson_dir: str) -> list[GeoDataFrame]:
-    filename_list = os.listdir(geojson_dir)
+
+def load_area_gdf_file(geojson_dir: str, filename: str, cache_dir: str = None) -> GeoDataFrame:
+    """
+    加载单个地区的 GeoJSON 文件。
+    给出 cache_dir 时，第一次加载后把结果写成 Feather 格式的二进制缓存，缓存文件名包含源文件的大小和修改时间；
+    之后直接以内存映射方式读取缓存，不必再解析 GeoJSON。未安装 pyarrow 时不使用缓存。
+    :param geojson_dir: 存放各地区 geojson 文件的目录
+    :param filename: 文件名
+    :param cache_dir: 缓存目录，为 None 时不使用缓存
+    :return: GeoDataFrame
+    """
+    file_path = os.path.join(geojson_dir, filename)
+    if cache_dir is None:
+        return gpd.read_file(file_path)
+    stat = os.stat(file_path)
+    cache_prefix = f'{filename}.'
+    cache_filename = f'{cache_prefix}{stat.st_size}.{stat.st_mtime_ns}.feather'
+    cache_path = os.path.join(cache_dir, cache_filename)
+    if os.path.exists(cache_path):
+        try:
+            return gpd.read_feather(cache_path, memory_map=True)
+        except ImportError:
+            return gpd.read_file(file_path)
+    gdf = gpd.read_file(file_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        # 不压缩，读取时才能直接映射
+        gdf.to_feather(tmp_path, compression='uncompressed')
+    except ImportError:
+        return gdf
+    os.replace(tmp_path, cache_path)
+    # 清理同一源文件旧版本的缓存
+    for stale in os.listdir(cache_dir):
+        if stale.startswith(cache_prefix) and stale.endswith('.feather') and stale != cache_filename:
+            os.remove(os.path.join(cache_dir, stale))
+    logger.info(f"已缓存行政区划 GeoJSON: {cache_path}")
+    return gdf
+
+
+def load_area_gdf_list(geojson_dir: str, cache_dir: str = None) -> list[GeoDataFrame]:
+    # 排序以保证每次加载的顺序一致，据此生成的缓存才能复用
+    filename_list = sorted(os.listdir(geojson_dir))
     @threaded_map_list(desc="Load Area GeoJSON files", unit='file(s)')
     def load_gdf_file(filename):
-        if filename.endswith(".json") or filename.endswith(".geojson"):
-            return gpd.read_file(os.path.join(geojson_dir, filename))
+        if is_area_geojson_file(filename):
+            return load_area_gdf_file(geojson_dir, filename, cache_dir)
         return None
 
     gdf_list = [gdf for gdf in load_gdf_file(filename_list) if gdf is not None]
                 
     return gdf_list
 
+def load_area_catalog(geojson_dir: str, cache_dir: str = None) -> dict[str, tuple[float, float, float, float]]:
+    """
+    获取各地区 GeoJSON 文件的外包矩形。
+    给出 cache_dir 时，结果连同文件的大小和修改时间保存在其中的 area_catalog.json 里，之后只需重新读取有变化的文件。
+    :param geojson_dir: 存放各地区 geojson 文件的目录
+    :param cache_dir: 缓存目录，为 None 时不使用缓存
+    :return: 文件名 -> (min_x, min_y, max_x, max_y)
+    """
+    catalog_path = os.path.join(cache_dir, 'area_catalog.json') if cache_dir is not None else None
+    saved = {}
+    if catalog_path is not None and os.path.exists(catalog_path):
+        with open(catalog_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    entries = {}
+    changed = False
+    for filename in sorted(os.listdir(geojson_dir)):
+        if not is_area_geojson_file(filename):
+            continue
+        stat = os.stat(os.path.join(geojson_dir, filename))
+        entry = saved.get(filename)
+        if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+            gdf = load_area_gdf_file(geojson_dir, filename, cache_dir)
+            entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'bounds': [float(i) for i in gdf.total_bounds]}
+            changed = True
+        entries[filename] = entry
+    if catalog_path is not None and (changed or entries.keys() != saved.keys()):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f'{catalog_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, catalog_path)
+    return {filename: tuple(entry['bounds']) for filename, entry in entries.items()}
+
+
+def estimate_gdf_memory(gdf: GeoDataFrame) -> int:
+    """粗略估计 GeoDataFrame 占用的内存（字节）：属性列加上每个坐标 16 字节"""
+    coordinates = shapely.get_num_coordinates(np.asarray(gdf.geometry.values)).sum()
+    return int(gdf.drop(columns=gdf.geometry.name).memory_usage(deep=True).sum() + coordinates * 16)
+
+
 class GDFListHandler:
     _instance_lock = threading.Lock()
     _instance = None  # 显式声明类变量用于存储单例实例
@@ -33,7 +150,29 @@ class GDFListHandler:
                 self.geojson_dir = geojson_dir
             else:
                 self.geojson_dir = GEOJSON_DIR
-            self.list = self.load()
+            self.lookup_cache: Optional[AreaLookupCache] = None
+            """按量化坐标缓存的查询结果，未配置 lookup_cache_cell_size 时为 None"""
+            if LOOKUP_CACHE_CELL_SIZE is not None:
+                self.lookup_cache = AreaLookupCache(
+                    LOOKUP_CACHE_CELL_SIZE, LOOKUP_CACHE_MAX_SIZE, namespace=area_geojson_fingerprint(self.geojson_dir)
+                )
+            self.lazy = LAZY_LOAD
+            """按需加载模式：启动时只读取各文件的外包矩形，文件在第一次被用到时才加载"""
+            self._lock = threading.RLock()
+            if self.lazy:
+                self.list = None
+                self.area_index = None
+                self.catalog = load_area_catalog(self.geojson_dir, CACHE_DIR)
+                self.memory_limit = int(LAZY_LOAD_MEMORY_LIMIT_MB * 1024 * 1024) if LAZY_LOAD_MEMORY_LIMIT_MB is not None else None
+                self._loaded: OrderedDict[str, tuple[GeoDataFrame, int]] = OrderedDict()
+                self._lazy_index_cache: OrderedDict[tuple[str, ...], AreaIndex] = OrderedDict()
+            else:
+                self.list = self.load()
+                self.area_index: AreaIndex = get_area_index(self.list)
+                if GRID_CELL_SIZE is not None:
+                    self.area_index.attach_grid(self.load_grid(GRID_CELL_SIZE))
+                if self.lookup_cache is not None:
+                    self.area_index.attach_cache(self.lookup_cache)
             GDFListHandler._initialized = True  # 标记为已初始化
 
     def __new__(cls, *args, **kwargs):
@@ -44,7 +183,77 @@ class GDFListHandler:
         return cls._instance
 
     def load(self):
-        return load_area_gdf_list(self.geojson_dir)
+        return load_area_gdf_list(self.geojson_dir, CACHE_DIR)
+
+    def load_grid(self, cell_size: float) -> AreaGrid:
+        """
+        加载行政区划查找网格。配置了缓存目录时，网格按 GeoJSON 文件的指纹保存在其中，之后启动的进程直接读取。
+        :param cell_size: 单元格边长，单位为度
+        :return: AreaGrid
+        """
+        grid_path = None
+        if CACHE_DIR is not None:
+            fingerprint = area_geojson_fingerprint(self.geojson_dir)
+            grid_path = os.path.join(CACHE_DIR, f'area_grid_{fingerprint}_{cell_size}.npy')
+        return AreaGrid.load_or_build(self.area_index, cell_size, grid_path)
+
+    def area_index_for_bounds(self, bounds: tuple[float, float, float, float]) -> AreaIndex:
+        """
+        获取能覆盖给定范围的 AreaIndex。
+        非按需加载模式下直接返回完整的索引；按需加载模式下，只加载外包矩形与该范围相交的文件，并用它们构建索引。
+        已加载的文件按最近使用顺序保留，总内存超过 lazy_load_memory_limit_mb 时淘汰最久未用的文件；
+        由文件组合构建的索引最多保留 lazy_load_index_cache_size 个。
+        :param bounds: (min_x, min_y, max_x, max_y)，如行程所有点的经纬度范围
+        :return: AreaIndex
+        """
+        if not self.lazy:
+            return self.area_index
+        min_x, min_y, max_x, max_y = bounds
+        filenames = tuple(
+            filename for filename, (f_min_x, f_min_y, f_max_x, f_max_y) in self.catalog.items()
+            if f_min_x <= max_x and f_max_x >= min_x and f_min_y <= max_y and f_max_y >= min_y
+        )
+        with self._lock:
+            gdf_list = [self._load_lazy(filename, filenames) for filename in filenames]
+            area_index = self._lazy_index_cache.get(filenames)
+            if area_index is None:
+                area_index = AreaIndex(gdf_list)
+                if self.lookup_cache is not None:
+                    area_index.attach_cache(self.lookup_cache)
+                self._lazy_index_cache[filenames] = area_index
+                # 每种文件组合都有一个索引，只保留最近使用的几个，避免随经过的地区组合无限增长
+                while len(self._lazy_index_cache) > LAZY_LOAD_INDEX_CACHE_SIZE:
+                    self._lazy_index_cache.popitem(last=False)
+            self._lazy_index_cache.move_to_end(filenames)
+            return area_index
+
+    def area_index_for_point(self, x: float, y: float) -> AreaIndex:
+        """
+        获取能覆盖给定点的 AreaIndex，见 area_index_for_bounds。
+        :param x: 经度
+        :param y: 纬度
+        :return: AreaIndex
+        """
+        return self.area_index_for_bounds((x, y, x, y))
+
+    def _load_lazy(self, filename: str, keep: tuple[str, ...]) -> GeoDataFrame:
+        """按需加载模式下加载单个文件，必要时淘汰不在 keep 中的、最久未用的文件"""
+        if filename in self._loaded:
+            self._loaded.move_to_end(filename)
+            return self._loaded[filename][0]
+        gdf = load_area_gdf_file(self.geojson_dir, filename, CACHE_DIR)
+        self._loaded[filename] = (gdf, estimate_gdf_memory(gdf))
+        if self.memory_limit is not None:
+            for evict_filename in list(self._loaded.keys()):
+                if sum(size for _, size in self._loaded.values()) <= self.memory_limit:
+                    break
+                if evict_filename in keep:
+                    continue
+                del self._loaded[evict_filename]
+                for key in [key for key in self._lazy_index_cache if evict_filename in key]:
+                    del self._lazy_index_cache[key]
+                logger.info(f"已释放行政区划 GeoJSON: {evict_filename}")
+        return gdf
 
 if __name__ == '__main__':
     GDF_LIST_HANDLER = GDFListHandler()
@@ -1,14 +1,17 @@
 import io
+import os
+import re
+import shutil
 from typing import Literal, TextIO, IO
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from xml.dom.minidom import parse, Document
-import codecs
 import sys
 from pathlib import Path
 
+import numpy as np
 from tqdm import tqdm
 
-from ..utils.process import threaded_map
+from ..utils import coord_transform
 from vendor.coordTransform_py.coordTransform_utils import wgs84_to_gcj02, wgs84_to_bd09, gcj02_to_wgs84, gcj02_to_bd09, \
     bd09_to_wgs84, bd09_to_gcj02
 
@@ -20,13 +23,42 @@ from vendor.coordTransform_py.coord_converter import convert_by_type
 
 coordinate_type_hint = Literal['wgs84', 'gcj02', 'bd09']
 
+_TRKPT_PATTERN = re.compile(
+    rb'(<(?:[\w.-]+:)?trkpt\b[^>]*?\s(lat|lon)\s*=\s*["\'])([^"\']*)'
+    rb'(["\'][^>]*?\s(?:lat|lon)\s*=\s*["\'])([^"\']*)(["\'][^>]*>)'
+)
+"""
+trkpt 开始标签。分组依次为：第一个坐标属性值之前的部分、第一个坐标属性名、第一个坐标属性值、两个值之间的部分、
+第二个坐标属性值、之后的部分。允许标签带命名空间前缀，lat、lon 先后顺序不限
+"""
+
+_convert_funcs = {
+    ('wgs84', 'gcj02'): coord_transform.wgs84_to_gcj02,
+    ('wgs84', 'bd09'): coord_transform.wgs84_to_bd09,
+    ('gcj02', 'wgs84'): coord_transform.gcj02_to_wgs84,
+    ('gcj02', 'bd09'): coord_transform.gcj02_to_bd09,
+    ('bd09', 'wgs84'): coord_transform.bd09_to_wgs84,
+    ('bd09', 'gcj02'): coord_transform.bd09_to_gcj02,
+}
+
+_precise_convert_funcs = {
+    ('gcj02', 'wgs84'): coord_transform.gcj02_to_wgs84_precise,
+    ('bd09', 'wgs84'): coord_transform.bd09_to_wgs84_precise,
+    ('bd09', 'gcj02'): coord_transform.bd09_to_gcj02_precise,
+}
+"""需要迭代求精确逆转换的转换方向，其余方向本身就是精确的"""
+
 def convert_single_point(
         lng, lat,
         original_coordinate_type: coordinate_type_hint,
-        transformed_coordinate_type: coordinate_type_hint
+        transformed_coordinate_type: coordinate_type_hint,
+        precise: bool = False
 ):
     if original_coordinate_type == transformed_coordinate_type:
         return lng, lat
+    if precise and (original_coordinate_type, transformed_coordinate_type) in _precise_convert_funcs:
+        result = _precise_convert_funcs[(original_coordinate_type, transformed_coordinate_type)](float(lng), float(lat))
+        return [float(result[0]), float(result[1])]
     if original_coordinate_type == 'wgs84':
         if transformed_coordinate_type == 'gcj02':
             return wgs84_to_gcj02(float(lng), float(lat))
@@ -76,19 +108,40 @@ def gen_convert_type(
             return 'b2g'
     raise AttributeError('Invalid coordinate type')
 
-@threaded_map(desc="Converting GPX points", unit="point(s)")
-def process_trkpt(trkpt, convert_type):
-    result = convert_by_type(float(trkpt.attributes['lon'].value), float(trkpt.attributes['lat'].value), convert_type)
-    trkpt.attributes['lon'].value = str(result[0])
-    trkpt.attributes['lat'].value = str(result[1])
-    return trkpt
+def convert_points(
+        lngs, lats,
+        original_coordinate_type: coordinate_type_hint,
+        transformed_coordinate_type: coordinate_type_hint,
+        precise: bool = False,
+        tolerance: float = coord_transform.DEFAULT_TOLERANCE
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    批量转换坐标，一次处理所有点。
+    :param lngs: 经度，数组或列表
+    :param lats: 纬度，数组或列表
+    :param original_coordinate_type: 原坐标类型
+    :param transformed_coordinate_type: 要转换为的坐标类型
+    :param precise: 转换为 WGS84（或由 BD09 转换为 GCJ02）时，是否迭代求精确结果。默认只做一步近似，误差可达数米
+    :param tolerance: precise == True 时的收敛阈值，单位为度
+    :return: (经度数组, 纬度数组)
+    """
+    lngs = np.asarray(lngs, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    if original_coordinate_type == transformed_coordinate_type:
+        return lngs, lats
+    if precise and (original_coordinate_type, transformed_coordinate_type) in _precise_convert_funcs:
+        return _precise_convert_funcs[(original_coordinate_type, transformed_coordinate_type)](lngs, lats, tolerance)
+    convert_func = _convert_funcs.get((original_coordinate_type, transformed_coordinate_type))
+    if convert_func is None:
+        raise AttributeError('Invalid coordinate type')
+    return convert_func(lngs, lats)
+
 def convert_gpx(
         file: str | IO,
         original_coordinate_type,
         transformed_coordinate_type,
 ) -> Document:
 
-    convert_type = gen_convert_type(original_coordinate_type, transformed_coordinate_type)
     dom_tree = parse(file)
     if original_coordinate_type == transformed_coordinate_type:
         return dom_tree
@@ -97,23 +150,115 @@ def convert_gpx(
     gpx_node = dom_tree.documentElement
     trkpt_nodes = gpx_node.getElementsByTagName("trkpt")
 
-    process_trkpt(trkpt_nodes, convert_type)
+    lngs = [float(trkpt.attributes['lon'].value) for trkpt in trkpt_nodes]
+    lats = [float(trkpt.attributes['lat'].value) for trkpt in trkpt_nodes]
+    lngs, lats = convert_points(lngs, lats, original_coordinate_type, transformed_coordinate_type)
+    for trkpt, lng, lat in tqdm(zip(trkpt_nodes, lngs.tolist(), lats.tolist()), total=len(trkpt_nodes),
+                                desc="Converting GPX points", unit="point(s)"):
+        trkpt.attributes['lon'].value = str(lng)
+        trkpt.attributes['lat'].value = str(lat)
 
     return dom_tree
 
 
+def _convert_gpx_chunk(
+        chunk: bytes,
+        original_coordinate_type: coordinate_type_hint,
+        transformed_coordinate_type: coordinate_type_hint,
+        precise: bool = False
+) -> tuple[bytes, int]:
+    """
+    转换一段 GPX 文本中所有 trkpt 标签的 lat、lon 属性，其余内容原样保留。
+    :param chunk: GPX 文本，不能在标签中间截断
+    :param original_coordinate_type: 原坐标类型
+    :param transformed_coordinate_type: 要转换为的坐标类型
+    :param precise: 是否迭代求精确的逆转换结果，见 convert_points
+    :return: (转换后的文本, 转换的点数)
+    """
+    # split 的结果为 [文本, 分组 1, ..., 分组 6, 文本, 分组 1, ...]，每个 trkpt 占 7 项
+    pieces = _TRKPT_PATTERN.split(chunk)
+    count = (len(pieces) - 1) // 7
+    if count == 0:
+        return chunk, 0
+    lat_first = np.array(pieces[2::7]) == b'lat'
+    first_values = np.array(pieces[3::7]).astype(np.float64)
+    second_values = np.array(pieces[5::7]).astype(np.float64)
+    lngs, lats = convert_points(
+        np.where(lat_first, second_values, first_values), np.where(lat_first, first_values, second_values),
+        original_coordinate_type, transformed_coordinate_type, precise
+    )
+    pieces[2::7] = [b''] * count  # 属性名已包含在分组 1 中
+    pieces[3::7] = [str(value).encode('ascii') for value in np.where(lat_first, lats, lngs).tolist()]
+    pieces[5::7] = [str(value).encode('ascii') for value in np.where(lat_first, lngs, lats).tolist()]
+    return b''.join(pieces), count
+
+
+def convert_gpx_stream(
+        in_file: str | IO[bytes],
+        out_file: str | IO[bytes],
+        original_coordinate_type: coordinate_type_hint,
+        transformed_coordinate_type: coordinate_type_hint,
+        chunk_size: int = 4 * 1024 * 1024,
+        precise: bool = False
+) -> int:
+    """
+    流式转换 GPX 文件的坐标：按块读取输入，批量转换每块中 trkpt 的 lat、lon 属性后立即写出，
+    不构建 DOM 树，内存占用与文件大小无关。除 lat、lon 的值外，文件其余内容按字节原样保留。
+    只支持 UTF-8 等与 ASCII 兼容的编码。
+    :param in_file: 输入文件路径，或以二进制模式打开的文件
+    :param out_file: 输出文件路径，或以二进制模式打开的文件
+    :param original_coordinate_type: 原坐标类型
+    :param transformed_coordinate_type: 要转换为的坐标类型
+    :param chunk_size: 每次读取的字节数
+    :param precise: 是否迭代求精确的逆转换结果，见 convert_points
+    :return: 转换的点数
+    """
+    in_f = open(in_file, 'rb') if isinstance(in_file, (str, os.PathLike)) else in_file
+    out_f = open(out_file, 'wb') if isinstance(out_file, (str, os.PathLike)) else out_file
+    try:
+        if original_coordinate_type == transformed_coordinate_type:
+            shutil.copyfileobj(in_f, out_f, chunk_size)
+            return 0
+        total = os.fstat(in_f.fileno()).st_size if isinstance(in_file, (str, os.PathLike)) else None
+        point_count = 0
+        tail = b''
+        with tqdm(total=total, desc="Converting GPX points", unit='B', unit_scale=True) as pbar:
+            while True:
+                data = in_f.read(chunk_size)
+                pbar.update(len(data))
+                buffer = tail + data
+                if len(data) == 0:
+                    # 文件结束，剩余部分全部处理
+                    tail = b''
+                else:
+                    # 最后一个标签可能被截断，留到下一块处理
+                    cut = buffer.rfind(b'<')
+                    if cut == -1 or buffer.find(b'>', cut) != -1:
+                        cut = len(buffer)
+                    buffer, tail = buffer[:cut], buffer[cut:]
+                converted, count = _convert_gpx_chunk(
+                    buffer, original_coordinate_type, transformed_coordinate_type, precise
+                )
+                out_f.write(converted)
+                point_count += count
+                if len(data) == 0:
+                    break
+        return point_count
+    finally:
+        if in_f is not in_file:
+            in_f.close()
+        if out_f is not out_file:
+            out_f.close()
+
+
 def convert_gpx_to_file(
         in_path,
         out_path,
         original_coordinate_type,
         transformed_coordinate_type,
+        precise: bool = False
 ):
-    dom_tree = convert_gpx(in_path, original_coordinate_type, transformed_coordinate_type)
-
-    with open(out_path, 'wb+') as f:
-        #解决写入中文乱码问题
-        f = codecs.lookup("utf-8")[3](f)
-        dom_tree.writexml(f, encoding='utf-8')
+    convert_gpx_stream(in_path, out_path, original_coordinate_type, transformed_coordinate_type, precise=precise)
 
 if __name__ == '__main__':
     convert_gpx_to_file(r"E:\project\recorded\202504旅游轨迹\20250402083731.gpx", 'gcj.gpx', original_coordinate_type='wgs84', transformed_coordinate_type='gcj02')
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""
+直接把 GPX 中的轨迹点读成数组，不构建 gpxpy 的对象。
+"""
+import io
+import os
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from typing import IO, Iterator, Optional
+
+import gpxpy.gpx
+import numpy as np
+from gpxpy.gpxfield import parse_time
+from xml.parsers import expat
+
+_READ_SIZE = 1024 * 1024
+"""每次交给解析器的字节数"""
+
+
+@dataclass
+class GPXPointArrays:
+    """
+    一个 segment 中所有轨迹点的数据，缺失的数值为 NaN，缺失的时间为 None
+    """
+    longitude: np.ndarray
+    """经度"""
+
+    latitude: np.ndarray
+    """纬度"""
+
+    elevation: np.ndarray
+    """高度"""
+
+    time: list[Optional[datetime]]
+    """时间"""
+
+    course: np.ndarray
+    """记录的方向，来自 GPX 1.0 的 course 或扩展中的 course"""
+
+    speed: np.ndarray
+    """记录的速度，来自 GPX 1.0 的 speed 或扩展中的 speed"""
+
+    def __len__(self):
+        return len(self.longitude)
+
+    def elapsed_seconds(self) -> np.ndarray:
+        """
+        各点相对第一个有时间的点的秒数（有符号），时间缺失时为 NaN。
+        :return: np.ndarray
+        """
+        first_time = next((time for time in self.time if time is not None), None)
+        return np.array([
+            (time - first_time).total_seconds() if time is not None and first_time is not None else np.nan
+            for time in self.time
+        ], dtype=np.float64)
+
+    @staticmethod
+    def from_gpx_segment(segment: gpxpy.gpx.GPXTrackSegment) -> 'GPXPointArrays':
+        """
+        从 gpxpy 的 segment 对象提取。
+        :param segment: gpxpy.gpx.GPXTrackSegment
+        :return: GPXPointArrays
+        """
+        points = segment.points
+        return GPXPointArrays(
+            longitude=np.array([point.longitude for point in points], dtype=np.float64),
+            latitude=np.array([point.latitude for point in points], dtype=np.float64),
+            elevation=np.array([
+                point.elevation if point.elevation is not None else np.nan for point in points
+            ], dtype=np.float64),
+            time=[point.time for point in points],
+            course=np.array([point.course if point.course is not None else np.nan for point in points], dtype=np.float64),
+            speed=np.array([point.speed if point.speed is not None else np.nan for point in points], dtype=np.float64),
+        )
+
+
+class _SegmentReader:
+    """
+    expat 的回调。只在需要读取的 segment 中收集 trkpt 的数据，不构建任何元素对象。
+    """
+
+    def __init__(self, track_index: Optional[int], segment_index: Optional[int]):
+        self.track_index = track_index
+        self.segment_index = segment_index
+        self.track_count = -1
+        self.segment_count = -1
+        self.finished: list[tuple[int, int, GPXPointArrays]] = []
+        """已读完、尚未返回的 segment"""
+        self.collecting = False
+        """当前 segment 是否需要读取"""
+        self.in_trkpt = False
+        self.extensions_depth = 0
+        self.text_parts: Optional[list[str]] = None
+        """正在收集文本的元素的文本片段，不需要收集时为 None"""
+        self._local_names: dict[str, str] = {}
+        """带命名空间的元素名到本地名的缓存"""
+        self._reset_segment()
+
+    def _reset_segment(self):
+        self.longitude = array('d')
+        self.latitude = array('d')
+        self.elevation = array('d')
+        self.course = array('d')
+        self.speed = array('d')
+        self.time: list[Optional[datetime]] = []
+
+    def _reset_point(self):
+        self.point_elevation = np.nan
+        self.point_time = None
+        self.point_course = np.nan
+        self.point_speed = np.nan
+        self.point_extension_course = np.nan
+        self.point_extension_speed = np.nan
+
+    def _local_name(self, name: str) -> str:
+        local_name = self._local_names.get(name)
+        if local_name is None:
+            local_name = self._local_names[name] = name.rsplit(' ', 1)[-1]
+        return local_name
+
+    def start(self, name: str, attrs: dict[str, str]):
+        name = self._local_name(name)
+        if self.in_trkpt:
+            if name == 'extensions':
+                self.extensions_depth += 1
+            elif name in ('ele', 'time', 'course', 'speed'):
+                self.text_parts = []
+        elif name == 'trkpt':
+            if self.collecting:
+                self.in_trkpt = True
+                self.longitude.append(float(attrs['lon']))
+                self.latitude.append(float(attrs['lat']))
+                self._reset_point()
+        elif name == 'trkseg':
+            self.segment_count += 1
+            self.collecting = (self.track_index is None or self.track_index == self.track_count) \
+                and (self.segment_index is None or self.segment_index == self.segment_count)
+        elif name == 'trk':
+            self.track_count += 1
+            self.segment_count = -1
+
+    def end(self, name: str):
+        name = self._local_name(name)
+        if self.in_trkpt:
+            if name == 'trkpt':
+                self.in_trkpt = False
+                self.elevation.append(self.point_elevation)
+                self.time.append(self.point_time)
+                # GPX 1.0 中直接记录的 course、speed 优先于扩展中的同名元素
+                self.course.append(
+                    self.point_course if not np.isnan(self.point_course) else self.point_extension_course
+                )
+                self.speed.append(
+                    self.point_speed if not np.isnan(self.point_speed) else self.point_extension_speed
+                )
+            elif name == 'extensions':
+                self.extensions_depth -= 1
+            elif self.text_parts is not None:
+                text = ''.join(self.text_parts)
+                self.text_parts = None
+                if name == 'ele':
+                    self.point_elevation = _parse_float(text)
+                elif name == 'time':
+                    self.point_time = _parse_time(text)
+                elif name == 'course':
+                    if self.extensions_depth > 0:
+                        self.point_extension_course = _parse_float(text)
+                    else:
+                        self.point_course = _parse_float(text)
+                elif name == 'speed':
+                    if self.extensions_depth > 0:
+                        self.point_extension_speed = _parse_float(text)
+                    else:
+                        self.point_speed = _parse_float(text)
+        elif name == 'trkseg' and self.collecting:
+            self.collecting = False
+            self.finished.append((self.track_count, self.segment_count, GPXPointArrays(
+                longitude=np.frombuffer(self.longitude, dtype=np.float64).copy(),
+                latitude=np.frombuffer(self.latitude, dtype=np.float64).copy(),
+                elevation=np.frombuffer(self.elevation, dtype=np.float64).copy(),
+                time=self.time,
+                course=np.frombuffer(self.course, dtype=np.float64).copy(),
+                speed=np.frombuffer(self.speed, dtype=np.float64).copy(),
+            )))
+            self._reset_segment()
+
+    def character_data(self, data: str):
+        if self.text_parts is not None:
+            self.text_parts.append(data)
+
+
+def _parse_float(text: Optional[str]) -> float:
+    if text is None:
+        return np.nan
+    text = text.strip()
+    return float(text) if text else np.nan
+
+
+def _parse_time(text: Optional[str]) -> Optional[datetime]:
+    if text is None or not text.strip():
+        return None
+    text = text.strip()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        # 非标准格式交给 gpxpy 处理
+        return parse_time(text)
+
+
+def iter_gpx_segments(
+        source: str | bytes | IO[bytes], track_index: Optional[int] = None, segment_index: Optional[int] = None
+) -> Iterator[tuple[int, int, GPXPointArrays]]:
+    """
+    流式读取 GPX，依次返回各个 segment 中轨迹点的数组。
+    使用 expat 逐块解析，只把 trkpt 的经纬度、高度、时间、方向、速度写入数组，不构建元素树，
+    内存占用只与结果大小有关。方向、速度除 GPX 1.0 的 course、speed 外，也读取扩展（任意命名空间）中的同名元素。
+    :param source: 文件路径、GPX 文件内容（bytes）或以二进制模式打开的文件
+    :param track_index: 只读取该 track，为 None 时读取全部
+    :param segment_index: 只读取该 segment，为 None 时读取全部
+    :return: (track 序号, segment 序号, GPXPointArrays)
+    """
+    reader = _SegmentReader(track_index, segment_index)
+    parser = expat.ParserCreate(namespace_separator=' ')
+    parser.buffer_text = True
+    parser.StartElementHandler = reader.start
+    parser.EndElementHandler = reader.end
+    parser.CharacterDataHandler = reader.character_data
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    f = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+    try:
+        while True:
+            data = f.read(_READ_SIZE)
+            parser.Parse(data, len(data) == 0)
+            while reader.finished:
+                yield reader.finished.pop(0)
+                if track_index is not None and segment_index is not None:
+                    return
+            if len(data) == 0:
+                break
+            if track_index is not None and reader.track_count > track_index:
+                return
+    finally:
+        if f is not source:
+            f.close()
+
+
+def read_gpx_segment(
+        source: str | bytes | IO[bytes], track_index: int = 0, segment_index: int = 0
+) -> GPXPointArrays:
+    """
+    读取 GPX 中一个 segment 的轨迹点。
+    :param source: 文件路径、GPX 文件内容（bytes）或以二进制模式打开的文件
+    :param track_index: track 序号
+    :param segment_index: segment 序号
+    :return: GPXPointArrays
+    """
+    for _, _, arrays in iter_gpx_segments(source, track_index, segment_index):
+        return arrays
+    raise IndexError(f'GPX 中没有 track {track_index} 的 segment {segment_index}')
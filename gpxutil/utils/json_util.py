@@ -0,0 +1,154 @@
+"""
+JSON 编解码。安装了 orjson 时用它解析、生成，否则使用标准库 json。
+另提供按 {"points": [...], ...} 这类结构逐项流式读写的函数，读写很长的行程时不需要在内存中同时保留完整的字符串和字典列表。
+"""
+import json
+import re
+from typing import Any, IO, Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_READ_SIZE = 1024 * 1024
+"""流式读取时每次读取的字符数"""
+
+_WRITE_BATCH_SIZE = 1000
+"""流式写入时每次写出的项数"""
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+_decoder = json.JSONDecoder()
+
+_NUMBER_CONTINUATION = frozenset('.eE+-0123456789')
+"""可以出现在数字中间的字符"""
+
+
+def loads(data: str | bytes) -> Any:
+    """
+    解析 JSON
+    :param data: JSON 字符串
+    :return: 解析结果
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> str:
+    """
+    生成 JSON 字符串，非 ASCII 字符不转义
+    :param obj: 要转换的对象
+    :return: str
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def dump_stream(f: IO[str], stream_key: str, items: Iterable[Any], other: dict[str, Any] = None):
+    """
+    把 {stream_key: [items 中的各项], **other} 写入文本文件。items 逐项转换、分批写出，不会拼出完整的列表或字符串
+    :param f: 以文本模式打开的文件
+    :param stream_key: 逐项写出的列表的键
+    :param items: 列表中的各项，可以是生成器
+    :param other: 其他键值，写在列表之后
+    :return: None
+    """
+    f.write('{' + dumps(stream_key) + ': [')
+    batch = []
+    separator = ''
+    for item in items:
+        batch.append(dumps(item))
+        if len(batch) >= _WRITE_BATCH_SIZE:
+            f.write(separator + ', '.join(batch))
+            separator = ', '
+            batch = []
+    if batch:
+        f.write(separator + ', '.join(batch))
+    f.write(']')
+    for key, value in (other or {}).items():
+        f.write(', ' + dumps(key) + ': ' + dumps(value))
+    f.write('}')
+
+
+def iter_stream(f: IO[str], stream_key: str) -> Iterator[tuple[str, Any]]:
+    """
+    流式解析顶层为对象的 JSON 文件。stream_key 对应的列表逐项返回 (stream_key, 项)，其他键返回 (键, 值)，顺序与文件中相同。
+    每次只读取 _READ_SIZE 个字符，内存占用与单项的大小有关，与文件大小无关。
+    :param f: 以文本模式打开的文件
+    :param stream_key: 逐项返回的列表的键
+    :return: (键, 值)
+    """
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        data = f.read(_READ_SIZE)
+        if not data:
+            eof = True
+            return False
+        buf = buf[pos:] + data
+        pos = 0
+        return True
+
+    def peek() -> str:
+        """跳过空白，返回下一个字符但不前进"""
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                raise ValueError('JSON 不完整')
+
+    def expect(chars: str) -> str:
+        nonlocal pos
+        char = peek()
+        if char not in chars:
+            raise ValueError(f'JSON 格式错误：位置 {pos} 处应为 {chars!r} 之一，实际为 {char!r}')
+        pos += 1
+        return char
+
+    def value() -> Any:
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                result, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # 值被读取边界截断，读入更多内容后重试
+                if fill():
+                    continue
+                raise
+            # 数字可能在读取边界处被截断：如 114.5 只读到 114. 时，raw_decode 返回 114，其后剩下 .
+            if isinstance(result, (int, float)) and not isinstance(result, bool) \
+                    and (end == len(buf) or buf[end] in _NUMBER_CONTINUATION) and fill():
+                continue
+            pos = end
+            return result
+
+    expect('{')
+    if peek() == '}':
+        return
+    while True:
+        key = value()
+        expect(':')
+        if key == stream_key:
+            expect('[')
+            if peek() == ']':
+                pos += 1
+            else:
+                while True:
+                    yield key, value()
+                    if expect(',]') == ']':
+                        break
+        else:
+            yield key, value()
+        if expect(',}') == '}':
+            return
@@ -1,4 +1,4 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from functools import wraps
 from typing import Callable, TypeVar, Collection
 
@@ -100,6 +100,44 @@ def threaded_map_list(
         return wrapper
     return decorator
 
+def process_map_list(
+    func: Callable[[T], R],
+    in_list: Collection[T],
+    desc: str = "Processing...",
+    unit: str = 'item(s)',
+    max_workers: int | None = None
+) -> list[R]:
+    """
+    通过多进程执行方式，对集合中的每个元素应用给定的函数，并按输入顺序返回结果列表。适合 CPU 密集、单个元素耗时较长的任务。
+    func、集合中的元素和结果都需要能被 pickle：func 应为模块级函数（或其 functools.partial），不能是被装饰器替换过的函数，所以这里不提供装饰器形式。
+    只有一个元素或 max_workers == 1 时直接在当前进程中执行，不创建进程池。
+
+    使用方式：
+
+    def test_func(list_item):
+        return list_item * 2
+
+    print(process_map_list(test_func, range(100))[0])
+
+    :param func: 接受单个参数并返回结果的函数
+    :param in_list: 要处理的集合
+    :param desc: 进度条的描述文本。
+    :param unit: 进度条中处理单位的字符串表示。
+    :param max_workers: 最大工作进程数，如果为None，则使用默认值（CPU 核数）。
+    :return: 每个元素处理结果的列表，顺序与输入一致
+    """
+    if len(in_list) <= 1 or max_workers == 1:
+        return [func(item) for item in tqdm(in_list, total=len(in_list), desc=desc, unit=unit)]
+    out_list = [None] * len(in_list)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(func, item): idx
+            for idx, item in enumerate(in_list)
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc=desc, unit=unit):
+            out_list[futures[future]] = future.result()
+    return out_list
+
 def metric(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
@@ -0,0 +1,168 @@
+"""
+行程的二进制文件格式。数值字段按列以定长格式连续存放，行政区划、道路名称等字符串放在文件末尾的字符串表中，
+每列只存字符串表中的序号。数值列可以直接用 numpy.memmap 打开，不需要解析。
+
+文件布局（版本 1，小端序）：
+- 文件头 _HEADER：
+  magic（8 字节，b'GPXROUTE'）、版本（uint32）、列数（uint32）、点数（int64）、
+  原坐标类型与转换后坐标类型在字符串表中的序号（int32 ×2，-1 表示 None）、
+  时区偏移秒数（int32）、是否有时区（int32，0 表示时间无时区）、
+  字符串表的位置（uint64）、字符串数（uint64）
+- 列目录，每列一项 _COLUMN：列名（32 字节，UTF-8，不足补 0）、numpy dtype 字符串（8 字节，如 '<f8'）、数据位置（uint64）
+- 各列数据，每列起始位置按 _ALIGNMENT 字节对齐，长度为 点数 × dtype 宽度
+- 字符串表：字符串数 + 1 个 uint64 的结束位置（第一个为 0，相对于其后的 UTF-8 数据），之后是所有字符串的 UTF-8 数据
+
+读取时忽略不认识的列，所以之后的版本可以在不改变已有列的前提下增加列。
+"""
+import struct
+from dataclasses import dataclass
+from typing import IO, Optional
+
+import numpy as np
+
+MAGIC = b'GPXROUTE'
+
+FORMAT_VERSION = 1
+"""当前写入的格式版本"""
+
+_HEADER = struct.Struct('<8sIIqiiiiQQ')
+_COLUMN = struct.Struct('<32s8sQ')
+_ALIGNMENT = 64
+
+
+@dataclass
+class RouteBinaryContent:
+    """
+    从二进制文件读取的内容
+    """
+    version: int
+    """格式版本"""
+
+    size: int
+    """点数"""
+
+    columns: dict[str, np.ndarray]
+    """各列数据，按 mmap 方式读取时为 numpy.memmap"""
+
+    strings: list[str]
+    """字符串表"""
+
+    coordinate_type: Optional[str]
+    """原始类型"""
+
+    transformed_coordinate_type: Optional[str]
+    """坐标转换后类型"""
+
+    time_tz_offset: Optional[int]
+    """时间的时区偏移（秒），为 None 表示时间无时区"""
+
+
+def _pad(f: IO[bytes]):
+    position = f.tell()
+    if position % _ALIGNMENT:
+        f.write(b'\0' * (_ALIGNMENT - position % _ALIGNMENT))
+
+
+def write_route_binary(
+        f: IO[bytes], size: int, columns: dict[str, np.ndarray], strings: list[str],
+        coordinate_type: Optional[str] = None, transformed_coordinate_type: Optional[str] = None,
+        time_tz_offset: Optional[int] = None
+):
+    """
+    写入二进制行程文件
+    :param f: 以二进制模式打开、可以 seek 的文件
+    :param size: 点数，各列长度都应等于点数
+    :param columns: 列名到数组的映射，按数组原有的 dtype 以小端序写入
+    :param strings: 字符串表，字符串列中存放的是其中的序号
+    :param coordinate_type: 原坐标类型
+    :param transformed_coordinate_type: 转换后坐标类型
+    :param time_tz_offset: 时间的时区偏移（秒），为 None 表示时间无时区
+    :return: None
+    """
+    strings = list(strings)
+
+    def string_code(value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        strings.append(value)
+        return len(strings) - 1
+
+    coordinate_type_code = string_code(coordinate_type)
+    transformed_coordinate_type_code = string_code(transformed_coordinate_type)
+
+    start = f.tell()
+    arrays = []
+    for name, array in columns.items():
+        if len(array) != size:
+            raise ValueError(f'列 {name} 的长度 {len(array)} 与点数 {size} 不同')
+        arrays.append((name, np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))))
+    # 先写占位的文件头和列目录，写完数据后再回填位置
+    f.write(b'\0' * (_HEADER.size + _COLUMN.size * len(arrays)))
+    offsets = []
+    for _, array in arrays:
+        _pad(f)
+        offsets.append(f.tell() - start)
+        f.write(array.view(np.uint8).data)
+
+    _pad(f)
+    string_table_offset = f.tell() - start
+    encoded = [value.encode('utf-8') for value in strings]
+    ends = np.zeros(len(encoded) + 1, dtype='<u8')
+    ends[1:] = np.cumsum([len(value) for value in encoded], dtype=np.int64)
+    f.write(ends.view(np.uint8).data)
+    f.write(b''.join(encoded))
+    end = f.tell()
+
+    f.seek(start)
+    f.write(_HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(arrays), size, coordinate_type_code, transformed_coordinate_type_code,
+        time_tz_offset or 0, time_tz_offset is not None, string_table_offset, len(strings)
+    ))
+    for (name, array), offset in zip(arrays, offsets):
+        f.write(_COLUMN.pack(name.encode('utf-8'), array.dtype.str.encode('ascii'), offset))
+    f.seek(end)
+
+
+def read_route_binary(file_path: str, mmap: bool = True) -> RouteBinaryContent:
+    """
+    读取二进制行程文件
+    :param file_path: 文件路径
+    :param mmap: 是否以 numpy.memmap（写时复制模式）打开各列。为 True 时只在访问数据时才从磁盘读取，修改数组不会写回文件
+    :return: RouteBinaryContent
+    """
+    with open(file_path, 'rb') as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{file_path} 不是二进制行程文件')
+        (
+            _, version, column_count, size, coordinate_type_code, transformed_coordinate_type_code,
+            time_tz_offset, has_time_tz, string_table_offset, string_count
+        ) = _HEADER.unpack(header)
+        if version > FORMAT_VERSION:
+            raise ValueError(f'{file_path} 的格式版本 {version} 高于支持的版本 {FORMAT_VERSION}')
+        column_entries = [
+            _COLUMN.unpack(f.read(_COLUMN.size)) for _ in range(column_count)
+        ]
+        f.seek(string_table_offset)
+        ends = np.frombuffer(f.read(8 * (string_count + 1)), dtype='<u8')
+        data = f.read(int(ends[-1]))
+    strings = [data[begin:end].decode('utf-8') for begin, end in zip(ends[:-1].tolist(), ends[1:].tolist())]
+
+    columns = {}
+    for name, dtype, offset in column_entries:
+        name = name.rstrip(b'\0').decode('utf-8')
+        dtype = np.dtype(dtype.rstrip(b'\0').decode('ascii'))
+        if mmap and size > 0:
+            columns[name] = np.memmap(file_path, dtype=dtype, mode='c', offset=offset, shape=(size,))
+        else:
+            columns[name] = np.fromfile(file_path, dtype=dtype, count=size, offset=offset)
+    return RouteBinaryContent(
+        version=version,
+        size=size,
+        columns=columns,
+        strings=strings,
+        coordinate_type=strings[coordinate_type_code] if coordinate_type_code >= 0 else None,
+        transformed_coordinate_type=strings[transformed_coordinate_type_code] if transformed_coordinate_type_code >= 0 else None,
+        time_tz_offset=time_tz_offset if has_time_tz else None,
+    )
+
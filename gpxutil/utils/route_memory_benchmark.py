@@ -0,0 +1,84 @@
+"""
+比较行程在内存中的占用。运行方式：python -m gpxutil.utils.route_memory_benchmark [点数]
+- dict：带 __dict__ 的 RoutePoint，且每个点的行政区划、道路名称都是单独的字符串（与改为 __slots__ 之前从 JSON、CSV 导入时相同）
+- slots：当前带 __slots__ 的 RoutePoint，行政区划、道路名称字符串已驻留
+- columnar：ColumnarRoute
+"""
+import dataclasses
+import sys
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from ..models.columnar_route import ColumnarRoute
+from ..models.route import Route, RoutePoint
+
+DictRoutePoint = dataclasses.make_dataclass(
+    'DictRoutePoint', [(field.name, field.type, field.default) for field in dataclasses.fields(RoutePoint)]
+)
+"""字段与 RoutePoint 相同，但不使用 __slots__"""
+
+_AREAS = [(f'省{i // 100}', f'市{i // 10}', f'县{i}', f'G{i}', f'道路{i}') for i in range(50)]
+
+
+def _copy_str(value: str) -> str:
+    """生成内容相同的新字符串对象，模拟逐行解析 JSON、CSV 得到的字符串"""
+    return (value + '.')[:-1]
+
+
+def _make_points(point_class, size: int, intern: bool) -> list:
+    start = datetime(2025, 4, 2, 8, tzinfo=timezone.utc)
+    text: Callable[[str], str] = sys.intern if intern else _copy_str
+    points = []
+    for i in range(size):
+        province, city, area, road_num, road_name = _AREAS[i // 2000 % len(_AREAS)]
+        points.append(point_class(
+            index=i,
+            time=start + timedelta(seconds=i),
+            elapsed_time=float(i),
+            longitude=116.3 + i * 1e-5,
+            latitude=39.9 + i * 1e-5,
+            longitude_transformed=116.306 + i * 1e-5,
+            latitude_transformed=39.901 + i * 1e-5,
+            elevation=50.0 + i % 7,
+            distance=i * 11.1,
+            course=45.0 + i % 90,
+            speed=11.1 + i % 3,
+            province=text(province),
+            city=text(city),
+            area=text(area),
+            road_num=text(road_num),
+            road_name=text(road_name),
+        ))
+    return points
+
+
+def _measure(builder: Callable[[], object]) -> tuple[object, int]:
+    tracemalloc.start()
+    try:
+        obj = builder()
+        return obj, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def measure_route_memory(size: int = 100000) -> dict[str, float]:
+    """
+    构建 size 个点的行程，测量每个点平均占用的字节数。
+    :param size: 点数
+    :return: {方式: 每点字节数}
+    """
+    _, dict_bytes = _measure(lambda: _make_points(DictRoutePoint, size, intern=False))
+    route, slots_bytes = _measure(lambda: Route(points=_make_points(RoutePoint, size, intern=True)))
+    _, columnar_bytes = _measure(lambda: ColumnarRoute.from_route(route))
+    return {
+        'dict': dict_bytes / size,
+        'slots': slots_bytes / size,
+        'columnar': columnar_bytes / size,
+    }
+
+
+if __name__ == '__main__':
+    point_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for name, per_point in measure_route_memory(point_count).items():
+        print(f'{name:>10}: {per_point:8.1f} bytes/point')
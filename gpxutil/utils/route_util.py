@@ -1,12 +1,16 @@
 import math
 import sqlite3
-from typing import List
+from typing import List, Optional
 
+import gpxpy.geo
 import gpxpy.gpx
+import numpy as np
 from geopandas import GeoDataFrame
 from loguru import logger
 from shapely import Point
 
+from .area_code_table import get_area_code_table
+from .area_index import AreaIndex, get_area_index
 from ..models.exceptions import PointAreaNotFoundException
 
 
@@ -30,48 +34,161 @@ def calculate_bearing(point1: gpxpy.gpx.GPXTrackPoint, point2: gpxpy.gpx.GPXTrac
     return bearing
 
 
-def get_area_id(point: Point, area_gdf_list: List[GeoDataFrame]) -> str:
+def calculate_distances(latitudes, longitudes, elevations=None) -> np.ndarray:
+    """
+    批量计算每个点与上一个点的距离，算法与 gpxpy 的 distance_3d 相同：
+    相距较远（经度或纬度差超过 0.2 度）时用 haversine 公式并忽略高度，否则用平面近似并计入高度差。
+    :param latitudes: 纬度数组
+    :param longitudes: 经度数组
+    :param elevations: 高度数组，缺失的高度为 NaN；为 None 时只计算平面距离
+    :return: 距离数组（米），第一个点为 0
+    """
+    lat = np.asarray(latitudes, dtype=np.float64)
+    lon = np.asarray(longitudes, dtype=np.float64)
+    ret = np.zeros(lat.shape, dtype=np.float64)
+    if lat.size < 2:
+        return ret
+    # 与 point.distance_3d(prev_point) 一致，1 为当前点，2 为上一个点
+    lat1, lat2 = lat[1:], lat[:-1]
+    lon1, lon2 = lon[1:], lon[:-1]
+    d_lat = lat1 - lat2
+    d_lon = lon1 - lon2
+
+    distance_2d = np.sqrt(d_lat * d_lat + (d_lon * np.cos(np.radians(lat1))) ** 2) * gpxpy.geo.ONE_DEGREE
+    if elevations is not None:
+        ele = np.asarray(elevations, dtype=np.float64)
+        d_ele = ele[1:] - ele[:-1]
+        flat = np.isnan(d_ele) | (d_ele == 0)
+        distance_2d = np.where(flat, distance_2d, np.sqrt(distance_2d ** 2 + np.where(flat, 0.0, d_ele) ** 2))
+
+    rad_lat1, rad_lat2 = np.radians(lat1), np.radians(lat2)
+    a = np.sin((rad_lat1 - rad_lat2) / 2) ** 2 + np.sin(np.radians(d_lon) / 2) ** 2 * np.cos(rad_lat1) * np.cos(rad_lat2)
+    haversine = 2 * np.arcsin(np.sqrt(a)) * gpxpy.geo.EARTH_RADIUS
+
+    ret[1:] = np.where((np.fabs(d_lat) > .2) | (np.fabs(d_lon) > .2), haversine, distance_2d)
+    return ret
+
+
+def to_optional_list(values: np.ndarray) -> list[Optional[float]]:
+    """
+    把 float 数组转换为列表，NaN 转换为 None。
+    :param values: 数组
+    :return: list[Optional[float]]
+    """
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def calculate_bearings(latitudes, longitudes) -> np.ndarray:
+    """
+    批量计算每个点相对上一个点的方位角，算法与 calculate_bearing 相同。
+    :param latitudes: 纬度数组
+    :param longitudes: 经度数组
+    :return: 方位角数组（度），第一个点为 0
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.asarray(longitudes, dtype=np.float64)
+    ret = np.zeros(lat.shape, dtype=np.float64)
+    if lat.size < 2:
+        return ret
+    lat1, lat2 = lat[:-1], lat[1:]
+    d_lon = np.radians(lon[1:] - lon[:-1])
+    x = np.cos(lat2) * np.sin(d_lon)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(d_lon)
+    ret[1:] = (np.degrees(np.arctan2(x, y)) + 360) % 360
+    return ret
+
+
+def forward_fill(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    把 valid 为 False 的位置替换为它之前最近一个 valid 为 True 的值，第一个位置必须有效。
+    :param values: 数组
+    :param valid: bool 数组
+    :return: 新数组
+    """
+    positions = np.where(valid, np.arange(len(values)), 0)
+    np.maximum.accumulate(positions, out=positions)
+    return values[positions]
+
+
+def calculate_speeds(distances: np.ndarray, elapsed_times: np.ndarray) -> np.ndarray:
+    """
+    批量计算每个点与上一个点之间的平均速度。
+    时间差为 0（时间戳重复）时无法计算，沿用上一个点的速度；时间缺失时为 NaN。
+    :param distances: 每个点与上一个点的距离数组（米）
+    :param elapsed_times: 每个点的时间数组（秒），只用于求差
+    :return: 速度数组（米/秒），第一个点为 0
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    times = np.asarray(elapsed_times, dtype=np.float64)
+    ret = np.zeros(distances.shape, dtype=np.float64)
+    if distances.size < 2:
+        return ret
+    time_differences = np.fabs(np.diff(times))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ret[1:] = distances[1:] / time_differences
+    duplicated = np.concatenate(([False], time_differences == 0))
+    return forward_fill(ret, ~duplicated)
+
+
+def calculate_courses(latitudes, longitudes, recorded_courses=None) -> np.ndarray:
+    """
+    批量计算每个点的方向。有记录的方向（非 0）时直接使用，否则用与上一个点的方位角；
+    两者都为 0（如原地不动）时沿用上一个点的方向。
+    :param latitudes: 纬度数组
+    :param longitudes: 经度数组
+    :param recorded_courses: GPX 中记录的方向数组，缺失为 NaN；为 None 时全部由方位角计算
+    :return: 方向数组（度），第一个点为 0
+    """
+    courses = calculate_bearings(latitudes, longitudes)
+    if recorded_courses is not None:
+        recorded = np.asarray(recorded_courses, dtype=np.float64)
+        has_recorded = ~np.isnan(recorded) & (recorded != 0)
+        courses = np.where(has_recorded, recorded, courses)
+    courses[:1] = 0
+    valid = courses != 0
+    valid[:1] = True
+    return forward_fill(courses, valid)
+
+
+def get_area_id(point: Point, area_gdf_list: List[GeoDataFrame] | AreaIndex) -> str:
     """
     获取给定点所在地区的行政区划代码。
     :param point: 点
-    :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表
+    :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表，或由其构建的 AreaIndex
     :return:
     """
-    for i, gdf in enumerate(area_gdf_list):
-        for index, row in gdf.iterrows():
-            polygon = row['geometry']  # 获取多边形
-            if polygon.contains(point):  # 判断点是否在多边形内
-                # print(f"点 ({point.x}, {point.y}) 在区域 {row['id']} 中，区域名称为 {row['name']}")
-                return row['id']
-    raise PointAreaNotFoundException(f"点 ({point.x}, {point.y}) 不在任何已知区域内")
+    area_id = get_area_index(area_gdf_list).query(point)
+    if area_id is None:
+        raise PointAreaNotFoundException(f"点 ({point.x}, {point.y}) 不在任何已知区域内")
+    return area_id
 
 
-def get_area_info(point: Point, area_gdf_list: List[GeoDataFrame], area_code_conn: sqlite3.Connection):
+def get_area_info(point: Point, area_gdf_list: List[GeoDataFrame] | AreaIndex, area_code_conn: sqlite3.Connection):
     """
     获取给定点所在地区的行政区划信息。
     :param point: 点
-    :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表
+    :param area_gdf_list: 各地区的 geojson 文件转换为 GeoDataFrame 后的列表，或由其构建的 AreaIndex
     :param area_code_conn: 存放行政区划代码关系的 SQLite 数据库连接
     :return: 省级、市级、县级行政区划名称
     """
-    cursor = area_code_conn.cursor()
     try:
         area_id = get_area_id(point, area_gdf_list)
     except PointAreaNotFoundException:
         return None, None, None
-    sql = """
-    select province.name, city.name, area.name
-    from province, city, area
-    where
-        province.code = area.provinceCode
-        and city.code = area.cityCode
-        and area.code = ?
-    """
-    cursor.execute(sql, (area_id,))
-    result = cursor.fetchone()
-    cursor.close()
-    return result
+    return get_area_info_by_id(area_id, area_code_conn)
+
 
+def get_area_info_by_id(area_id: str, area_code_conn: sqlite3.Connection):
+    """
+    根据行政区划代码获取行政区划信息。名称从进程内共享的行政区划代码表中查找，不会每次查询数据库。
+    :param area_id: 行政区划代码
+    :param area_code_conn: 存放行政区划代码关系的 SQLite 数据库连接
+    :return: 省级、市级、县级行政区划名称
+    """
+    area_info = get_area_code_table(area_code_conn).get(area_id)
+    if area_info is None:
+        return None
+    return area_info.province, area_info.city, area_info.area
 
 if __name__ == '__main__':
     from src.gpxutil.core.config import CONFIG_HANDLER
@@ -0,0 +1,246 @@
+"""
+批量导入 GPX 文件。
+
+遍历目录中的 GPX 文件，在进程池中解析、转换坐标、查询所在地区，再在主进程中分批写入数据库。
+每个文件的行程、点和导入记录（route_imports）在同一个事务中提交，重新运行时跳过内容哈希已导入过的文件，可以随时中断后继续。
+
+执行命令：
+python ingest.py <目录> --user-id 1 --transform --transformed-coordinate-type gcj02 --set-area
+"""
+import argparse
+import glob
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, Future, FIRST_COMPLETED, wait
+from itertools import islice
+from typing import Optional
+
+from loguru import logger
+from tqdm import tqdm
+
+from dto.route import Route, segment_route_name
+from entity.area import get_area_code_table
+from entity.route import RouteEntity, RouteImportEntity, RoutePointBulkWriter
+from ext import db
+from gpxutil.models.enum_class import CoordinateType
+from gpxutil.utils.gdf_handler import GDFListHandler
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_content_hash(file_path: str) -> str:
+    """
+    计算文件内容的 SHA-256
+    :param file_path: 文件路径
+    :return: 十六进制字符串
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while block := f.read(_HASH_BLOCK_SIZE):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _init_worker(set_area: bool):
+    """
+    工作进程初始化：需要填写行政区划时加载一次行政区划索引，之后该进程处理的所有文件共用
+    """
+    if set_area:
+        GDFListHandler()
+
+
+def _ingest_file(
+        file_path: str, import_mode: str, transform_coordinate: bool,
+        coordinate_type: str, transformed_coordinate_type: str, set_area: bool
+) -> list[tuple[Optional[int], Optional[int], Route, Optional[list[Optional[str]]]]]:
+    """
+    在工作进程中处理一个文件
+    :return: [(track 序号, segment 序号, Route, 各点的地区代码)]，不填写行政区划时地区代码为 None
+    """
+    segment_routes = Route.from_gpx_segments(
+        file_path, transform_coordinate, coordinate_type, transformed_coordinate_type, max_workers=1
+    )
+    results = []
+    for track_index, segment_index, route in Route.combine_segments(segment_routes, import_mode):
+        area_ids = None
+        if set_area:
+            # 地区代码到名称的转换在主进程中用数据库中的代码表完成，这里只查询代码
+            area_ids = GDFListHandler().area_index_for_bounds(route.bounds()).query_many(
+                [point.longitude for point in route.points], [point.latitude for point in route.points]
+            )
+        results.append((track_index, segment_index, route, area_ids))
+    return results
+
+
+class _BatchWriter:
+    """
+    把各文件的结果写入数据库。点由 RoutePointBulkWriter 攒够 batch_size 个才执行一次批量插入；
+    提交只发生在文件之间，保证每个文件的导入记录与其行程、点同时提交。
+    """
+
+    def __init__(self, user_id: int, coordinate_type: str, transformed_coordinate_type: str, batch_size: int):
+        self.user_id = user_id
+        self.coordinate_type = coordinate_type
+        self.transformed_coordinate_type = transformed_coordinate_type
+        self.batch_size = batch_size
+        self.point_writer = RoutePointBulkWriter(user_id, batch_size)
+        self.uncommitted_point_count = 0
+        self.file_count = 0
+        self.route_count = 0
+        self.point_count = 0
+
+    def add_file(
+            self, file_path: str, content_hash: str,
+            results: list[tuple[Optional[int], Optional[int], Route, Optional[list[Optional[str]]]]]
+    ):
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        # 写入器在整个导入过程中共用，每个文件的点使用处理该文件时的时间
+        self.point_writer.reset_timestamp()
+        route_ids = []
+        file_point_count = 0
+        for track_index, segment_index, route, area_ids in results:
+            if area_ids is not None:
+                area_code_table = get_area_code_table()
+                for point, area_id in zip(route.points, area_ids):
+                    point.set_area_info(area_code_table.get(area_id) if area_id is not None else None)
+            route_entity = RouteEntity(
+                name=segment_route_name(name, track_index, segment_index),
+                coordinate_type=self.coordinate_type,
+                transformed_coordinate_type=self.transformed_coordinate_type,
+                segment_starts=','.join(map(str, route.segment_start_idxs())) or None,
+                create_user=self.user_id,
+                update_user=self.user_id
+            )
+            db.session.add(route_entity)
+            db.session.flush()  # 获取行程 ID
+            route_ids.append(route_entity.id)
+            self.point_writer.add(route_entity.id, route.points)
+            file_point_count += len(route.points)
+        db.session.add(RouteImportEntity(
+            create_user=self.user_id, update_user=self.user_id, content_hash=content_hash,
+            file_name=os.path.basename(file_path)[:255], route_ids=','.join(map(str, route_ids)),
+            point_count=file_point_count
+        ))
+        self.file_count += 1
+        self.route_count += len(route_ids)
+        self.point_count += file_point_count
+        self.uncommitted_point_count += file_point_count
+        if self.uncommitted_point_count >= self.batch_size:
+            self.commit()
+
+    def commit(self):
+        self.point_writer.flush()
+        db.session.commit()
+        self.uncommitted_point_count = 0
+
+
+def ingest_directory(
+        directory: str, user_id: int, pattern: str = '**/*.gpx', import_mode: str = 'segments',
+        transform_coordinate: bool = False, coordinate_type: str = 'wgs84', transformed_coordinate_type: str = 'wgs84',
+        set_area: bool = False, max_workers: Optional[int] = None, batch_size: int = 50000
+) -> tuple[int, int, int, int]:
+    """
+    批量导入目录中的 GPX 文件，需要在 Flask 应用上下文中调用
+    :param directory: 目录
+    :param user_id: 导入的行程所属用户
+    :param pattern: 文件名匹配模式，相对 directory，支持 **
+    :param import_mode: segments、tracks 或 merged，见 Route.combine_segments
+    :param transform_coordinate: 是否转换坐标
+    :param coordinate_type: 原坐标类型
+    :param transformed_coordinate_type: 转换后坐标类型
+    :param set_area: 是否填写行政区划
+    :param max_workers: 最大工作进程数，为 None 时使用 CPU 核数
+    :param batch_size: 每次批量插入、提交的点数
+    :return: (导入的文件数, 跳过的文件数, 失败的文件数, 导入的点数)
+    """
+    file_paths = sorted(
+        path for path in glob.glob(os.path.join(directory, pattern), recursive=True) if os.path.isfile(path)
+    )
+    imported_hashes = {
+        content_hash for content_hash, in
+        db.session.query(RouteImportEntity.content_hash).filter(RouteImportEntity.is_deleted == False).all()
+    }
+    tasks: list[tuple[str, str]] = []
+    for file_path in tqdm(file_paths, total=len(file_paths), desc="Hash GPX Files", unit='file(s)'):
+        content_hash = file_content_hash(file_path)
+        if content_hash in imported_hashes:
+            continue
+        # 目录中内容相同的文件只导入一次
+        imported_hashes.add(content_hash)
+        tasks.append((file_path, content_hash))
+    skipped_count = len(file_paths) - len(tasks)
+    logger.info(f'共 {len(file_paths)} 个文件，跳过已导入的 {skipped_count} 个')
+
+    writer = _BatchWriter(user_id, coordinate_type, transformed_coordinate_type, batch_size)
+    failed_count = 0
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(set_area,)) as executor, \
+            tqdm(total=len(tasks), desc="Ingest GPX Files", unit='file(s)') as progress:
+        task_iter = iter(tasks)
+        futures: dict[Future, tuple[str, str]] = {}
+        while True:
+            # 同时提交的文件不超过工作进程数的两倍，避免写入数据库较慢时结果堆积在内存中
+            for file_path, content_hash in islice(task_iter, max_workers * 2 - len(futures)):
+                futures[executor.submit(
+                    _ingest_file, file_path, import_mode, transform_coordinate,
+                    coordinate_type, transformed_coordinate_type, set_area
+                )] = (file_path, content_hash)
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path, content_hash = futures.pop(future)
+                progress.update()
+                try:
+                    results = future.result()
+                except Exception as e:
+                    failed_count += 1
+                    logger.error(f'导入失败: {file_path}: {e}')
+                    continue
+                writer.add_file(file_path, content_hash, results)
+    writer.commit()
+    logger.info(
+        f'导入完成：{writer.file_count} 个文件，{writer.route_count} 条行程，{writer.point_count} 个点；'
+        f'跳过 {skipped_count} 个，失败 {failed_count} 个；插入点用时 {writer.point_writer.elapsed_seconds:.1f} 秒'
+    )
+    return writer.file_count, skipped_count, failed_count, writer.point_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量导入 GPX 文件')
+    parser.add_argument('directory', help='GPX 文件所在目录')
+    parser.add_argument('--user-id', type=int, required=True, help='导入的行程所属用户 ID')
+    parser.add_argument('--pattern', default='**/*.gpx', help='文件名匹配模式，相对目录，默认 **/*.gpx')
+    parser.add_argument(
+        '--import-mode', choices=['segments', 'tracks', 'merged'], default='segments',
+        help='segments：每个 segment 一条行程；tracks：每个 track 一条行程；merged：每个文件一条行程'
+    )
+    parser.add_argument('--transform', action='store_true', help='转换坐标')
+    parser.add_argument(
+        '--coordinate-type', choices=[i.value for i in CoordinateType], default=CoordinateType.WGS84.value,
+        help='原坐标类型'
+    )
+    parser.add_argument(
+        '--transformed-coordinate-type', choices=[i.value for i in CoordinateType], default=CoordinateType.WGS84.value,
+        help='转换后坐标类型'
+    )
+    parser.add_argument('--set-area', action='store_true', help='填写行政区划')
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数，默认为 CPU 核数')
+    parser.add_argument('--batch-size', type=int, default=50000, help='每次批量插入、提交的点数')
+    args = parser.parse_args()
+
+    from app import app
+
+    start_time = time.time()
+    with app.app_context():
+        ingest_directory(
+            args.directory, args.user_id, args.pattern, args.import_mode,
+            args.transform, args.coordinate_type, args.transformed_coordinate_type,
+            args.set_area, args.workers, args.batch_size
+        )
+    logger.info(f'用时 {time.time() - start_time:.1f} 秒')
+
+
+if __name__ == '__main__':
+    main()
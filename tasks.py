@@ -9,20 +9,33 @@ from entity.task import TaskEntity, SubTaskEntity
 from ext import db
 from gpxutil.utils.gdf_handler import GDFListHandler
 
-def add_set_route_points_area_task(point_entities: list[RoutePointEntity], current_user_id: int):
-    if not point_entities:
+def add_set_route_points_area_task(route_id: int, current_user_id: int):
+    """
+    为行程中所有未删除的点创建填写行政区划的子任务。只查询点的 ID，不加载点对象
+    :param route_id: 行程 ID
+    :param current_user_id: 当前用户 ID
+    :return: 任务 ID，行程中没有点时为 None
+    """
+    point_ids = [
+        point_id for point_id, in
+        db.session.query(RoutePointEntity.id)
+        .filter(RoutePointEntity.route_id == route_id, RoutePointEntity.is_deleted == False)
+        .order_by(RoutePointEntity.idx)
+        .all()
+    ]
+    if not point_ids:
         return None
     task_entity = TaskEntity(
-        create_user=current_user_id, update_user=current_user_id, task_type='set_route_points_area', ref_id=point_entities[0].route_id,
+        create_user=current_user_id, update_user=current_user_id, task_type='set_route_points_area', ref_id=route_id,
         ref_type='route'
     )
     db.session.add(task_entity)
     db.session.flush()
-    for i in point_entities:
-        result = set_route_point_area_task.delay(i.id)
+    for point_id in point_ids:
+        result = set_route_point_area_task.delay(point_id)
         sub_task_entity = SubTaskEntity(
             create_user=current_user_id, update_user=current_user_id, task_id=task_entity.id,
-            celery_task_id=result.id, ref_type='route_point', ref_id=i.id
+            celery_task_id=result.id, ref_type='route_point', ref_id=point_id
         )
         db.session.add(sub_task_entity)
     db.session.commit()
@@ -46,7 +59,7 @@ def set_route_point_area_task(route_point_id: int):
         return
     point_dto: RoutePoint = point_entity.to_dto()
     try:
-        point_dto.set_area(GDFListHandler().list, True)
+        point_dto.set_area(GDFListHandler().area_index_for_point(float(point_dto.longitude), float(point_dto.latitude)), True)
         point_entity.province = point_dto.province
         point_entity.city = point_dto.city
         point_entity.area = point_dto.area